@@ -0,0 +1,176 @@
+# client/assets.py
+import json
+import os
+import sys
+
+import pygame
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.world import WINDOW_WIDTH, WINDOW_HEIGHT, KIND_COLORS
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CACHE_DIR = os.path.join(ROOT_DIR, '.asset_cache')
+
+# Cambiar si cambia cómo se preprocesan las imágenes (invalida la caché)
+PIPELINE_VERSION = 1
+
+BACKGROUND_SOURCE = 'Space1.png'
+ROBOT_SOURCE = 'GreenRobotSprite.png'
+VIRUS_SOURCE = 'VirusRojo.png'
+
+# Tamaño en pantalla de cada sprite (el robot se dibuja como un cuadrado de
+# 20 px; virus y enemigos con el diámetro de su círculo)
+ROBOT_SIZE = 20
+ENTITY_SIZES = {'mites': 7, 'enemies': 17}
+
+# Separación entre sprites dentro del atlas
+ATLAS_PADDING = 1
+
+
+def _fit(image, size):
+    """
+    Escala 'image' para que quepa en un cuadrado de 'size' px sin deformarla.
+    """
+    w, h = image.get_size()
+    scale = size / max(w, h)
+    return pygame.transform.smoothscale(image, (max(1, round(w * scale)), max(1, round(h * scale))))
+
+
+def _tint(image, color):
+    """
+    Virus del color del tipo: el rojo es el original; el resto se pasa a
+    escala de grises y se multiplica por el color.
+    """
+    if color == 'red':
+        return image
+    tinted = pygame.transform.grayscale(image)
+    tinted.fill(pygame.Color(color), special_flags=pygame.BLEND_RGB_MULT)
+    return tinted
+
+
+def _pack(images):
+    """
+    Empaqueta las imágenes en filas (de la más alta a la más baja) y
+    retorna (atlas, {nombre: (x, y, ancho, alto)}).
+    """
+    order = sorted(images, key=lambda name: images[name].get_height(), reverse=True)
+    width = max(img.get_width() for img in images.values()) * 4 + ATLAS_PADDING * 4
+    rects = {}
+    x = y = shelf = 0
+    for name in order:
+        w, h = images[name].get_size()
+        if x + w > width:
+            x, y, shelf = 0, y + shelf + ATLAS_PADDING, 0
+        rects[name] = (x, y, w, h)
+        x += w + ATLAS_PADDING
+        shelf = max(shelf, h)
+    atlas = pygame.Surface((width, y + shelf), pygame.SRCALPHA)
+    for name, (x, y, w, h) in rects.items():
+        atlas.blit(images[name], (x, y))
+    return atlas, rects
+
+
+def _sources():
+    return [os.path.join(ROOT_DIR, name) for name in (BACKGROUND_SOURCE, ROBOT_SOURCE, VIRUS_SOURCE)]
+
+
+def _cache_key():
+    """
+    Identifica la versión de los PNG de origen y del preprocesado.
+    """
+    stats = [(os.path.basename(p), os.path.getsize(p), int(os.path.getmtime(p))) for p in _sources()]
+    return [PIPELINE_VERSION, WINDOW_WIDTH, WINDOW_HEIGHT, ROBOT_SIZE, ENTITY_SIZES, stats]
+
+
+def build_cache():
+    """
+    Preprocesa los PNG una sola vez: fondo escalado a la ventana y atlas
+    con el robot y los virus ya escalados (y teñidos por tipo). Se guardan
+    en bruto (RGB / RGBA) para cargarlos sin decodificar ni escalar.
+    """
+    background = pygame.image.load(os.path.join(ROOT_DIR, BACKGROUND_SOURCE))
+    background = pygame.transform.smoothscale(background, (WINDOW_WIDTH, WINDOW_HEIGHT))
+
+    robot = pygame.image.load(os.path.join(ROOT_DIR, ROBOT_SOURCE))
+    virus = pygame.image.load(os.path.join(ROOT_DIR, VIRUS_SOURCE))
+    images = {'robot': _fit(robot, ROBOT_SIZE)}
+    for name, size in ENTITY_SIZES.items():
+        base = _fit(virus, size)
+        for kind, color in enumerate(KIND_COLORS):
+            images[f'{name}/{kind}'] = _tint(base, color)
+    atlas, rects = _pack(images)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(os.path.join(CACHE_DIR, 'background.raw'), 'wb') as f:
+        f.write(pygame.image.tobytes(background, 'RGB'))
+    with open(os.path.join(CACHE_DIR, 'atlas.raw'), 'wb') as f:
+        f.write(pygame.image.tobytes(atlas, 'RGBA'))
+    # El índice se escribe al final: sin él la caché no se considera válida
+    index = {'key': _cache_key(), 'atlas_size': atlas.get_size(), 'rects': rects}
+    with open(os.path.join(CACHE_DIR, 'index.json'), 'w') as f:
+        json.dump(index, f)
+    return index
+
+
+def _load_index():
+    try:
+        with open(os.path.join(CACHE_DIR, 'index.json')) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get('key') != json.loads(json.dumps(_cache_key())):
+        return None
+    return index
+
+
+class Assets:
+    """
+    Imágenes del juego en el formato de la pantalla, cargadas sólo cuando
+    se piden por primera vez. Si faltan los PNG, cada consulta retorna None
+    y el cliente dibuja las figuras de siempre.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._background = None
+        self._atlas = None
+        self._sprites = {}
+        self.available = all(os.path.exists(p) for p in _sources())
+
+    def _ensure_index(self):
+        if self._index is None:
+            self._index = _load_index() or build_cache()
+        return self._index
+
+    @property
+    def background(self):
+        if not self.available:
+            return None
+        if self._background is None:
+            self._ensure_index()
+            with open(os.path.join(CACHE_DIR, 'background.raw'), 'rb') as f:
+                raw = f.read()
+            # convert(): formato de la pantalla, el blit no convierte nada
+            self._background = pygame.image.frombytes(raw, (WINDOW_WIDTH, WINDOW_HEIGHT), 'RGB').convert()
+        return self._background
+
+    def sprite(self, name):
+        """
+        Sprite 'robot', 'mites/<kind>' o 'enemies/<kind>' como subsuperficie
+        del atlas (comparte sus píxeles).
+        """
+        if not self.available:
+            return None
+        sprite = self._sprites.get(name)
+        if sprite is None:
+            index = self._ensure_index()
+            if self._atlas is None:
+                with open(os.path.join(CACHE_DIR, 'atlas.raw'), 'rb') as f:
+                    raw = f.read()
+                size = tuple(index['atlas_size'])
+                self._atlas = pygame.image.frombytes(raw, size, 'RGBA').convert_alpha()
+            rect = index['rects'].get(name)
+            if rect is None:
+                return None
+            sprite = self._sprites[name] = self._atlas.subsurface(rect)
+        return sprite
@@ -0,0 +1,57 @@
+# client/headless_client.py
+import random
+import sys
+import threading
+import time
+from net_client import NetClient
+
+# Teclas que se pulsan al azar con --keys
+ARROWS = ('UP', 'DOWN', 'LEFT', 'RIGHT')
+
+def main():
+    """
+    Cliente sin ventana para pruebas de carga: se suscribe al estado y, con
+    --keys, pulsa y suelta flechas al azar. Termina al pasar los segundos
+    indicados (0: sin límite) o cuando el servidor cierra la conexión.
+    """
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    duration = float(args[0]) if args else 0
+    press_keys = '--keys' in sys.argv
+
+    net_client = NetClient()
+    net_client.connect()
+    if not net_client.sock:
+        sys.exit(1)
+
+    received = [0]
+    lock = threading.Lock()
+    def on_state(state):
+        with lock:
+            received[0] += 1
+    net_client.subscribe(on_state)
+
+    start = time.monotonic()
+    held = None
+    try:
+        while net_client.connected:
+            if duration and time.monotonic() - start >= duration:
+                break
+            if press_keys:
+                if held:
+                    net_client.set_key(held, False)
+                held = random.choice(ARROWS)
+                net_client.set_key(held, True)
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[Headless] {received[0]} estados en {time.monotonic() - start:.1f} s")
+        lost = not net_client.connected
+        if not lost:
+            net_client.send_cmd({'cmd': 'EXIT'})
+        net_client.close()
+    # Código 1 si fue el servidor quien cerró (el supervisor lo relanza)
+    sys.exit(1 if lost else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,34 @@
 # client/main_client.py
 import pygame
 import sys
-import time
 import threading
+import time
 from net_client import NetClient
-
-def network_listener(client, state_container, stop_event):
-    while not stop_event.is_set():
-        try:
-            new_state = client.send_cmd({'cmd': 'GET_STATE'})
-            if new_state is None:
-                continue
-            with state_container['lock']:
+from prediction import SnapshotBuffer, Predictor
+from render import Renderer
+from assets import Assets
+
+# Teclas de dirección -> dirección del comando KEY
+ARROW_KEYS = {
+    pygame.K_UP: 'UP',
+    pygame.K_DOWN: 'DOWN',
+    pygame.K_LEFT: 'LEFT',
+    pygame.K_RIGHT: 'RIGHT',
+}
+
+def make_state_listener(state_container):
+    """
+    Callback para la suscripción: guarda cada estado enviado por el servidor
+    en el buffer de interpolación (se descartan los más antiguos que el
+    último) y lo deja pendiente para reconciliar la predicción.
+    """
+    def on_state(new_state):
+        with state_container['lock']:
+            if new_state.get('seq', 0) >= state_container['state'].get('seq', 0):
                 state_container['state'] = new_state
-        except Exception as e:
-            print("Error in network listener:", e)
-        time.sleep(0.05)
+                state_container['buffer'].add(new_state, time.monotonic())
+                state_container['new'].append(new_state)
+    return on_state
 
 def main():
     pygame.init()
@@ -28,92 +41,106 @@ def main():
     if not net_client.sock:
         print("No se pudo conectar al servidor. Saliendo.")
         pygame.quit()
-        sys.exit()
+        sys.exit(1)
 
     # Contenedor compartido para el estado recibido
-    state_container = {'state': {}, 'lock': threading.Lock()}
-    stop_event = threading.Event()
-    net_thread = threading.Thread(target=network_listener, args=(net_client, state_container, stop_event))
-    net_thread.start()
+    state_container = {'state': {}, 'buffer': SnapshotBuffer(), 'new': [],
+                       'lock': threading.Lock()}
+    on_state = make_state_listener(state_container)
+    # El servidor envía el estado cuando cambia; no hace falta sondear
+    initial_state = net_client.subscribe(on_state)
+    if initial_state:
+        on_state(initial_state)
 
     font = pygame.font.SysFont(None, 24)
     prime_font = pygame.font.SysFont(None, 30)
-    
+    # Fondo estático y sprites: cada fotograma sólo se repinta lo que cambia
+    # Las imágenes se preprocesan una vez y se guardan en .asset_cache/
+    renderer = Renderer(screen, font, prime_font, Assets())
+
     # Variable para almacenar el resultado de la verificación de primos
     prime_result = ""
 
+    # Predicción local del movimiento manual
+    predictor = Predictor()
+
+    def send_key(key, pressed):
+        # La respuesta es el estado del tick en que el servidor aplicó la
+        # tecla: relaciona ese tick con el tick local de la predicción
+        with state_container['lock']:
+            local_tick = predictor.set_key(key, pressed)
+        def on_reply(reply):
+            if isinstance(reply, dict) and 'seq' in reply:
+                with state_container['lock']:
+                    predictor.key_applied(local_tick, reply['seq'])
+                on_state(reply)
+        net_client.send_async({'cmd': 'KEY', 'key': key, 'pressed': pressed}, on_reply)
+
+    def on_prime(response):
+        nonlocal prime_result
+        # Almacenar el resultado en la variable para mostrarlo en pantalla
+        prime_result = response if isinstance(response, str) else str(response)
+        print("Resultado de verificación:", prime_result)
+
     running = True
     while running:
         clock.tick(30)
+        if not net_client.connected:
+            # El servidor se cayó: se sale con error y el supervisor relanza
+            # el cliente cuando el servidor vuelva a estar listo
+            print("Conexión con el servidor perdida. Saliendo.")
+            break
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
+            elif event.type == pygame.KEYUP:
+                if event.key in ARROW_KEYS:
+                    send_key(ARROW_KEYS[event.key], False)
+
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     running = False
-                elif event.key == pygame.K_UP:
-                    net_client.send_cmd({'cmd': 'MOVE', 'direction': 'UP'})
-                elif event.key == pygame.K_DOWN:
-                    net_client.send_cmd({'cmd': 'MOVE', 'direction': 'DOWN'})
-                elif event.key == pygame.K_LEFT:
-                    net_client.send_cmd({'cmd': 'MOVE', 'direction': 'LEFT'})
-                elif event.key == pygame.K_RIGHT:
-                    net_client.send_cmd({'cmd': 'MOVE', 'direction': 'RIGHT'})
+                elif event.key in ARROW_KEYS:
+                    # Sólo se envían los flancos; el servidor mueve el robot
+                    # mientras la tecla siga pulsada
+                    send_key(ARROW_KEYS[event.key], True)
                 elif event.key == pygame.K_p:
                     # Bloquea el ciclo principal para solicitar el número (esto es temporal)
                     numero = input("Ingrese número para verificar si es primo: ").strip()
-                    response = net_client.send_cmd({'cmd': 'CHECK_PRIME', 'numero': numero})
-                    # Almacenar el resultado en la variable para mostrarlo en pantalla
-                    prime_result = response if isinstance(response, str) else str(response)
-                    print("Resultado de verificación:", prime_result)
+                    # El resultado llega cuando el servidor termina; mientras
+                    # tanto el juego sigue
+                    prime_result = "comprobando..."
+                    net_client.send_async({'cmd': 'CHECK_PRIME', 'numero': numero}, on_prime)
 
+        now = time.monotonic()
         with state_container['lock']:
             state = state_container.get('state', {})
-
-        screen.fill((211, 211, 211))
-        # Extraer datos del estado
-        x = state.get('x', 200)
-        y = state.get('y', 180)
-        vidas = state.get('vidas', 0)
-        rad = state.get('radiacion', 0)
-        score = state.get('score', 0)
-        zonas = state.get('zonas', {})
-        zona_offsets = state.get('zona_offsets', {})
-
-        # Dibujar zonas
-        for zona, size in zonas.items():
-            offset = zona_offsets.get(zona, (0, 0))
-            pygame.draw.rect(screen, (100, 100, 200), (offset[0], offset[1], size[0], size[1]), 2)
-
-        # Dibujar el robot
-        pygame.draw.rect(screen, (0, 255, 0), (x, y, 20, 20))
-
-        # Dibujar HUD
-        txt_vidas = font.render(f"Vidas: {vidas}", True, (0, 0, 0))
-        txt_rad = font.render(f"Radiación: {rad:.1f}", True, (255, 0, 0))
-        txt_score = font.render(f"Score: {score}", True, (0, 0, 0))
-        screen.blit(txt_vidas, (10, 10))
-        screen.blit(txt_rad, (10, 30))
-        screen.blit(txt_score, (10, 50))
-        
-        # Dibujar el resultado de la verificación de número primo
-        if prime_result:
-            prime_text = prime_font.render(f"Primo: {prime_result}", True, (0, 0, 255))
-            screen.blit(prime_text, (10, 80))
-
-        if state.get('game_over', False):
-            go_text = font.render("GAME OVER", True, (255, 0, 0))
-            screen.blit(go_text, (250, 400))
-
-        pygame.display.flip()
-
-    stop_event.set()
-    net_thread.join()
-    net_client.send_cmd({'cmd': 'EXIT'})
+            nuevos, state_container['new'] = state_container['new'], []
+            if state.get('control_mode') == 'manual':
+                # Robot predicho al instante actual, corregido con el servidor
+                if predictor.x is None:
+                    predictor.reset(state['x'], state['y'])
+                for nuevo in nuevos:
+                    predictor.reconcile(nuevo)
+                predictor.advance(now)
+                pos = predictor.position()
+            else:
+                # Robot interpolado entre los últimos estados recibidos
+                predictor.stop()
+                pos = state_container['buffer'].position(now)
+
+        x, y = pos if pos else (state.get('x', 200), state.get('y', 180))
+        renderer.update(state, (x, y), prime_result)
+        renderer.draw()
+
+    lost = not net_client.connected
+    if not lost:
+        net_client.send_cmd({'cmd': 'EXIT'})
     net_client.close()
     pygame.quit()
-    sys.exit()
+    # Código 1 si fue el servidor quien cerró
+    sys.exit(1 if lost else 0)
 
 if __name__ == "__main__":
     main()
@@ -1,40 +1,256 @@
 # client/net_client.py
 import socket
 import json
+import os
+import sys
+import threading
+from concurrent.futures import Future
+
+# Permite importar el paquete 'common' al ejecutar el cliente directamente
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.protocol import (MAGIC, MSG_PUSH, MSG_PUSH_DELTA, FrameDecoder, JsonStreamDecoder,
+                             ProtocolError, StateTracker, decode_message, encode_cmd)
+
+# Marca de una respuesta con estado que no se pudo reconstruir (delta sin base)
+_RESYNC = object()
 
 class NetClient:
-    def __init__(self, host='127.0.0.1', port=5000):
+    def __init__(self, host='127.0.0.1', port=5000, json_mode=False):
+        """
+        json_mode=True usa el modo texto JSON del servidor (para depurar);
+        por defecto se negocia el protocolo binario por tramas.
+        """
         self.host = host
         self.port = port
+        self.json_mode = json_mode
         self.sock = None
+        self.decoder = None
+        # Escrituras en el socket (los ACK salen también desde el hilo lector)
+        self._send_lock = threading.Lock()
+        # Estados recibidos, para aplicar los deltas del servidor
+        self.tracker = StateTracker()
+
+        # Cada petición lleva un id; el hilo lector resuelve su Future
+        # cuando llega la respuesta con ese id
+        self._next_id = 0
+        self._requests = {}
+        self._reply_to = None
+        self._reader_done = False
+
+        # Suscripción: el hilo lector pasa los envíos del servidor a on_push
+        self.on_push = None
+        self._reader = None
 
     def connect(self):
         try:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.connect((self.host, self.port))
+            self.tracker = StateTracker()
+            self._reply_to = None
+            self._reader_done = False
+            if self.json_mode:
+                self.decoder = JsonStreamDecoder()
+            else:
+                self.sock.sendall(MAGIC)
+                ack = b''
+                while len(ack) < len(MAGIC):
+                    chunk = self.sock.recv(len(MAGIC) - len(ack))
+                    if not chunk:
+                        break
+                    ack += chunk
+                if ack != MAGIC:
+                    raise ProtocolError("El servidor no aceptó el protocolo binario")
+                self.decoder = FrameDecoder()
+            self._reader = threading.Thread(target=self._reader_loop, daemon=True)
+            self._reader.start()
         except Exception as e:
             print("Error connecting to server:", e)
+            if self.sock:
+                self.sock.close()
             self.sock = None
 
     def close(self):
         if self.sock:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            # Tras el shutdown el hilo lector ve el fin de la conexión y termina
+            if self._reader and self._reader is not threading.current_thread():
+                self._reader.join()
+            self._reader = None
             self.sock.close()
             self.sock = None
 
+    @property
+    def connected(self):
+        """
+        True mientras la conexión siga abierta (el hilo lector sigue vivo).
+        """
+        return self._reader is not None and self._reader.is_alive()
+
+    def _encode(self, cmd_dict):
+        if self.json_mode:
+            return (json.dumps(cmd_dict) + '\n').encode('utf-8')
+        return encode_cmd(cmd_dict)
+
+    def _send(self, cmd_dict):
+        with self._send_lock:
+            self.sock.sendall(self._encode(cmd_dict))
+
+    def _reader_loop(self):
+        try:
+            while True:
+                data = self.sock.recv(4096)
+                if not data:
+                    break
+                for item in self.decoder.feed(data):
+                    if self.json_mode:
+                        push = isinstance(item, dict) and item.pop('push', False)
+                        self._handle(push, item)
+                    else:
+                        msg_type, payload = item
+                        self._handle(msg_type in (MSG_PUSH, MSG_PUSH_DELTA),
+                                     decode_message(msg_type, payload))
+        except (OSError, ProtocolError) as e:
+            print("Error in reader:", e)
+        finally:
+            # Desbloquear a quien espere una respuesta
+            with self._send_lock:
+                requests, self._requests = self._requests, {}
+                self._reader_done = True
+            for future, _, _ in requests.values():
+                future.set_result(None)
+
+    def _handle(self, push, value):
+        """
+        Reparte un mensaje recibido. Los estados (completos o deltas) se
+        reconstruyen y se confirman con ACK antes de entregarlos.
+        """
+        if isinstance(value, dict) and 'reply_to' in value:
+            # El siguiente mensaje es la respuesta de esa petición
+            self._reply_to = value['reply_to']
+            return
+        if isinstance(value, dict) and 'seq' in value:
+            value = self._apply_state(value)
+            if value is None:
+                if push:
+                    return
+                value = _RESYNC
+
+        if push:
+            if self.on_push:
+                self.on_push(value)
+            return
+
+        req_id, self._reply_to = self._reply_to, None
+        request = self._requests.pop(req_id, None)
+        if request is None:
+            return
+        future, cmd_dict, retried = request
+        if value is _RESYNC:
+            if not retried:
+                # Tras el ACK 0 la siguiente respuesta llega completa
+                self._send_requests([(future, cmd_dict)], retried=True)
+                return
+            value = None
+        future.set_result(value)
+
+    def _apply_state(self, msg):
+        state = self.tracker.apply(msg)
+        # ACK 0: no tenemos la base del delta, pedir un estado completo
+        self._send({'cmd': 'ACK', 'seq': state['seq'] if state else 0})
+        return state
+
+    def subscribe(self, on_push, mode='change'):
+        """
+        Pide al servidor que envíe el estado por su cuenta (mode 'change':
+        sólo cuando cambia; 'tick': en cada tick). Cada estado recibido se
+        pasa a on_push desde el hilo lector. Retorna el estado actual.
+        """
+        self.on_push = on_push
+        return self.send_cmd({'cmd': 'SUBSCRIBE', 'mode': mode})
+
+    def set_view(self, rect=None, zona=None):
+        """
+        Limita los virus y enemigos recibidos a un rectángulo (x, y, ancho,
+        alto) o a una zona; sin argumentos se vuelven a recibir todos.
+        """
+        cmd = {'cmd': 'SET_VIEW'}
+        if rect is not None:
+            cmd['rect'] = list(rect)
+        if zona is not None:
+            cmd['zona'] = zona
+        return self.send_cmd(cmd)
+
+    def set_key(self, key, pressed):
+        """
+        Avisa de que se pulsa o suelta una tecla de dirección ('UP', 'DOWN',
+        'LEFT', 'RIGHT'). No tiene respuesta: el robot se mueve en el
+        servidor mientras la tecla siga pulsada.
+        """
+        try:
+            self._send({'cmd': 'KEY', 'key': key, 'pressed': pressed})
+        except (OSError, AttributeError) as e:
+            print("Error in set_key:", e)
+
     def send_cmd(self, cmd_dict):
+        """
+        Envía un comando y espera su respuesta.
+        """
+        return self.send_async(cmd_dict).result()
+
+    def send_async(self, cmd_dict, callback=None):
+        """
+        Envía un comando sin esperar la respuesta. Retorna un Future que se
+        resuelve con ella (None si la conexión se cierra); 'callback', si se
+        da, se llama con la respuesta (desde el hilo lector).
+        """
+        return self.send_batch([cmd_dict], callback)[0]
+
+    def send_batch(self, cmds, callback=None):
+        """
+        Envía varios comandos de una vez, sin esperar entre ellos, y retorna
+        un Future por comando en el mismo orden. El servidor los atiende a la
+        vez, así que el lote cuesta un solo viaje de ida y vuelta.
+        """
+        futures = [Future() for _ in cmds]
+        if callback:
+            for future in futures:
+                future.add_done_callback(lambda f: callback(f.result()))
         if not self.sock:
             print("Socket is not connected")
-            return None
-        try:
-            data_str = json.dumps(cmd_dict)
-            self.sock.sendall(data_str.encode('utf-8'))
-            resp = self.sock.recv(4096)
-            if not resp:
-                return None
+            for future in futures:
+                future.set_result(None)
+            return futures
+        self._send_requests(list(zip(futures, cmds)), retried=False)
+        return futures
+
+    def _send_requests(self, requests, retried):
+        data = []
+        ids = []
+        with self._send_lock:
+            if self._reader_done:
+                # Conexión cerrada: nadie resolvería las respuestas
+                for future, _ in requests:
+                    future.set_result(None)
+                return
+            for future, cmd_dict in requests:
+                if cmd_dict.get('cmd') == 'EXIT':
+                    # No tiene respuesta
+                    data.append(self._encode(cmd_dict))
+                    future.set_result(None)
+                    continue
+                # Se registra antes de enviar: la respuesta puede llegar enseguida
+                self._next_id = (self._next_id + 1) % 2**32
+                self._requests[self._next_id] = (future, cmd_dict, retried)
+                ids.append(self._next_id)
+                data.append(self._encode(dict(cmd_dict, id=self._next_id)))
             try:
-                return json.loads(resp.decode('utf-8'))
-            except:
-                return resp.decode('utf-8')
-        except Exception as e:
-            print("Error in send_cmd:", e)
-            return None
+                self.sock.sendall(b''.join(data))
+                return
+            except OSError as e:
+                print("Error in send_cmd:", e)
+                failed = [self._requests.pop(i) for i in ids if i in self._requests]
+        for future, _, _ in failed:
+            future.set_result(None)
@@ -0,0 +1,179 @@
+# client/prediction.py
+import os
+import sys
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.world import TICK, manual_step
+
+# Retraso con el que se dibujan los estados interpolados (algo más de un tick
+# para tener casi siempre el siguiente estado ya recibido)
+INTERP_DELAY = 1.5 * TICK
+
+# Estados y pasos predichos que se conservan
+BUFFER_SIZE = 32
+HISTORY_SIZE = 64
+
+# Fracción del error de reconciliación que queda tras cada fotograma
+SMOOTHING = 0.8
+
+
+class SnapshotBuffer:
+    """
+    Estados recientes del servidor para dibujar interpolando entre ellos.
+
+    El tiempo de cada estado sale de su seq (un seq por tick), no de cuándo
+    llegó: la hora local del tick se estima con el menor retraso observado,
+    así las irregularidades de la red no se ven en pantalla.
+    """
+
+    def __init__(self):
+        self.states = deque(maxlen=BUFFER_SIZE)
+        self.offset = None
+
+    def add(self, state, now):
+        seq = state.get('seq')
+        if seq is None:
+            return
+        if self.states and seq <= self.states[-1]['seq']:
+            return
+        self.states.append(state)
+        offset = now - seq * TICK
+        if self.offset is None or offset < self.offset:
+            self.offset = offset
+
+    @property
+    def latest(self):
+        return self.states[-1] if self.states else {}
+
+    def position(self, now):
+        """
+        Posición (x, y) del robot interpolada para el instante 'now'.
+        """
+        if not self.states:
+            return None
+        t = (now - INTERP_DELAY - self.offset) / TICK
+        prev = None
+        for state in self.states:
+            if state['seq'] >= t:
+                break
+            prev = state
+        else:
+            # Sin estados más nuevos: el último conocido
+            return self.states[-1]['x'], self.states[-1]['y']
+        if prev is None:
+            return state['x'], state['y']
+        # En modo 'change' un hueco de seqs quiere decir que nada cambió
+        # hasta el tick anterior al nuevo estado
+        start = max(prev['seq'], state['seq'] - 1)
+        f = min(1.0, max(0.0, t - start))
+        return (prev['x'] + (state['x'] - prev['x']) * f,
+                prev['y'] + (state['y'] - prev['y']) * f)
+
+
+class Predictor:
+    """
+    Predicción del movimiento manual en el cliente.
+
+    Avanza el robot por ticks locales con las teclas pulsadas y las mismas
+    reglas que el servidor (common.world). Cada tecla enviada con id vuelve
+    con el seq en que el servidor la aplicó, lo que da la correspondencia
+    entre ticks locales y seqs. Al llegar un estado autoritativo se compara
+    con lo predicho para ese tick y, si no coincide, se repiten los pasos
+    posteriores desde la posición del servidor. La corrección se reparte en
+    varios fotogramas para que no se vean saltos.
+    """
+
+    def __init__(self):
+        self.keys = set()
+        self.x = self.y = None
+        self.tick = 0
+        self.next_time = None
+        # (tick local, x, y, teclas) tras cada paso predicho
+        self.history = deque(maxlen=HISTORY_SIZE)
+        # seq del servidor - tick local (None hasta la primera tecla confirmada)
+        self.offset = None
+        self.error = (0.0, 0.0)
+
+    def reset(self, x, y):
+        self.x, self.y = x, y
+        self.history.clear()
+        self.error = (0.0, 0.0)
+
+    def stop(self):
+        """
+        Deja de predecir (modo automático); se conservan las teclas pulsadas.
+        """
+        self.x = self.y = None
+        self.next_time = None
+        self.history.clear()
+        self.offset = None
+        self.error = (0.0, 0.0)
+
+    def set_key(self, key, pressed):
+        """
+        Cambia una tecla y retorna el tick local en que se aplica.
+        """
+        if pressed:
+            self.keys.add(key)
+        else:
+            self.keys.discard(key)
+        return self.tick + 1
+
+    def key_applied(self, local_tick, seq):
+        self.offset = seq - local_tick
+
+    def advance(self, now):
+        if self.next_time is None:
+            self.next_time = now
+        while now >= self.next_time:
+            self.next_time += TICK
+            self.tick += 1
+            if self.x is None:
+                continue
+            keys = frozenset(self.keys)
+            self.x, self.y = manual_step(self.x, self.y, keys)
+            self.history.append((self.tick, self.x, self.y, keys))
+
+    def reconcile(self, state):
+        """
+        Corrige la predicción con un estado autoritativo.
+        """
+        x, y = state['x'], state['y']
+        if self.x is None or (self.offset is None and not self.keys):
+            # Nada que predecir todavía: seguir al servidor
+            self.reset(x, y)
+            return
+        if self.offset is None:
+            return
+        tick = state['seq'] - self.offset
+        steps = list(self.history)
+        for i, (t, px, py, _) in enumerate(steps):
+            if t == tick:
+                break
+        else:
+            if not steps or tick < steps[0][0]:
+                # Demasiado antiguo o sin historial: no se puede repetir
+                self.reset(x, y)
+            return
+        if abs(px - x) < 0.01 and abs(py - y) < 0.01:
+            return
+
+        # Repetir los pasos posteriores desde la posición del servidor
+        old = (self.x, self.y)
+        self.history = deque(steps[:i], maxlen=HISTORY_SIZE)
+        self.history.append((tick, x, y, steps[i][3]))
+        for t, _, _, keys in steps[i + 1:]:
+            x, y = manual_step(x, y, keys)
+            self.history.append((t, x, y, keys))
+        self.x, self.y = x, y
+        ex, ey = self.error
+        self.error = (ex + old[0] - x, ey + old[1] - y)
+
+    def position(self):
+        """
+        Posición para dibujar: la predicha más lo que queda de la corrección.
+        """
+        ex, ey = self.error
+        self.error = (ex * SMOOTHING, ey * SMOOTHING)
+        return self.x + ex, self.y + ey
@@ -7,13 +7,24 @@ def iniciar_cliente():
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
         client_socket.connect((host, puerto))
-        # Solicitar al usuario un número entero
-        numero = input("Introduce un número entero: ").strip()
-        client_socket.send(numero.encode())
-        
-        # Recibir la respuesta del servidor
-        respuesta = client_socket.recv(1024).decode()
-        print("Respuesta del servidor:", respuesta)
+        # La conexión se mantiene: una petición por línea hasta que se deje vacía
+        respuestas = client_socket.makefile('r', encoding='utf-8')
+        while True:
+            # Solicitar al usuario un número entero (o BATCH / COUNT / RANGE)
+            numero = input("Introduce un número entero (vacío para salir): ").strip()
+            if not numero:
+                break
+            client_socket.sendall((numero + '\n').encode())
+
+            # Recibir la respuesta del servidor; la de RANGE acaba en una línea vacía
+            respuesta = respuestas.readline().rstrip('\n')
+            if numero.upper().startswith('RANGE') and not respuesta.startswith("Error"):
+                lineas = []
+                while respuesta:
+                    lineas.append(respuesta)
+                    respuesta = respuestas.readline().rstrip('\n')
+                respuesta = ' '.join(lineas)
+            print("Respuesta del servidor:", respuesta)
     except Exception as e:
         print(f"Error en la conexión: {e}")
     finally:
@@ -0,0 +1,189 @@
+# client/render.py
+import os
+import sys
+
+import pygame
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.world import (WINDOW_WIDTH, WINDOW_HEIGHT, HUECO_RECT, ZONAS, ZONA_OFFSETS,
+                          KIND_COLORS)
+from assets import ROBOT_SIZE, ENTITY_SIZES
+
+BACKGROUND_COLOR = (211, 211, 211)
+ZONE_COLOR = (100, 100, 200)
+HUECO_COLOR = (200, 50, 50)
+ROBOT_COLOR = (0, 255, 0)
+
+# Textos renderizados que se conservan antes de vaciar la caché
+TEXT_CACHE_SIZE = 256
+
+
+def build_background(image=None):
+    """
+    Fondo estático: se dibuja una sola vez (imagen de fondo, zonas y hueco)
+    y después sólo se copia la parte que haya que borrar en cada fotograma.
+    """
+    background = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT)).convert()
+    if image is not None:
+        background.blit(image, (0, 0))
+    else:
+        background.fill(BACKGROUND_COLOR)
+    pygame.draw.rect(background, HUECO_COLOR, HUECO_RECT)
+    for zona, (ancho, alto) in ZONAS.items():
+        ox, oy = ZONA_OFFSETS[zona]
+        pygame.draw.rect(background, ZONE_COLOR, (ox, oy, ancho, alto), 2)
+    return background
+
+
+class TextCache:
+    """
+    Superficies de texto ya renderizadas, por (texto, color). El HUD cambia
+    poco, así que casi nunca hace falta volver a llamar a font.render.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self.cache = {}
+
+    def render(self, text, color):
+        key = (text, color)
+        surface = self.cache.get(key)
+        if surface is None:
+            if len(self.cache) >= TEXT_CACHE_SIZE:
+                self.cache.clear()
+            surface = self.cache[key] = self.font.render(text, True, color)
+        return surface
+
+
+class TextSprite(pygame.sprite.DirtySprite):
+    """
+    Línea de texto del HUD; sólo se marca para redibujar si el texto cambia.
+    """
+
+    def __init__(self, cache, pos, color, layer=2):
+        super().__init__()
+        self._layer = layer
+        self.cache = cache
+        self.pos = pos
+        self.color = color
+        self.text = None
+        self.set_text('')
+
+    def set_text(self, text):
+        if text == self.text:
+            return
+        self.text = text
+        self.image = self.cache.render(text, self.color)
+        self.rect = self.image.get_rect(topleft=self.pos)
+        self.visible = 1 if text else 0
+        self.dirty = 1
+
+
+class PointSprite(pygame.sprite.DirtySprite):
+    """
+    Sprite con una imagen fija que sólo se redibuja al moverse.
+    """
+
+    def __init__(self, image, layer):
+        super().__init__()
+        self._layer = layer
+        self.image = image
+        self.rect = image.get_rect()
+        self.pos = None
+
+    def move_to(self, x, y, anchor='center'):
+        pos = (int(x), int(y))
+        if pos == self.pos:
+            return
+        self.pos = pos
+        setattr(self.rect, anchor, pos)
+        self.dirty = 1
+
+
+class Renderer:
+    """
+    Dibujo del cliente con sprites y rectángulos sucios: cada fotograma sólo
+    se borran (copiando del fondo) y se vuelven a pintar las zonas de la
+    pantalla que cambiaron, y sólo esas se envían a la ventana.
+    """
+
+    def __init__(self, screen, font, big_font, assets=None):
+        """
+        'assets' (Assets) da las imágenes del juego; sin él, o si faltan,
+        se dibujan figuras.
+        """
+        self.screen = screen
+        image = assets.background if assets else None
+        self.background = build_background(image)
+        self.sprites = pygame.sprite.LayeredDirty()
+        self.sprites.clear(screen, self.background)
+        screen.blit(self.background, (0, 0))
+        pygame.display.flip()
+
+        # Imágenes compartidas por todas las entidades de un mismo tipo
+        self.entity_images = {}
+        for name, size in ENTITY_SIZES.items():
+            for kind, color in enumerate(KIND_COLORS):
+                image = assets.sprite(f'{name}/{kind}') if assets else None
+                if image is None:
+                    radius = size // 2
+                    image = pygame.Surface((size, size), pygame.SRCALPHA)
+                    pygame.draw.circle(image, color, (radius, radius), radius)
+                self.entity_images[name, kind] = image
+        # Sprites por lista: uid -> sprite, y el dict del estado que reflejan
+        self.entities = {name: {} for name in ENTITY_SIZES}
+        self.synced = {name: None for name in ENTITY_SIZES}
+
+        robot = assets.sprite('robot') if assets else None
+        if robot is None:
+            robot = pygame.Surface((ROBOT_SIZE, ROBOT_SIZE))
+            robot.fill(ROBOT_COLOR)
+        self.robot = PointSprite(robot, layer=1)
+        self.sprites.add(self.robot)
+
+        texts = TextCache(font)
+        big_texts = TextCache(big_font)
+        # Sobre la imagen de fondo (oscura) el texto negro no se lee
+        hud = (0, 0, 0) if image is None else (255, 255, 255)
+        self.vidas = TextSprite(texts, (10, 10), hud)
+        self.radiacion = TextSprite(texts, (10, 30), (255, 0, 0))
+        self.score = TextSprite(texts, (10, 50), hud)
+        self.prime = TextSprite(big_texts, (10, 80), (0, 0, 255))
+        self.game_over = TextSprite(texts, (250, 400), (255, 0, 0))
+        self.sprites.add(self.vidas, self.radiacion, self.score, self.prime, self.game_over)
+
+    def sync_entities(self, state):
+        """
+        Añade y quita sprites según las listas de entidades del estado. Si
+        el dict de una lista es el mismo objeto que la vez anterior, no
+        cambió nada y no se recorre.
+        """
+        for name, sprites in self.entities.items():
+            live = state.get(name)
+            if live is None or live is self.synced[name]:
+                continue
+            self.synced[name] = live
+            for uid in [uid for uid in sprites if uid not in live]:
+                sprites.pop(uid).kill()
+            for uid, (x, y, kind) in live.items():
+                if uid not in sprites:
+                    sprite = PointSprite(self.entity_images[name, kind % len(KIND_COLORS)], layer=0)
+                    sprite.move_to(x, y)
+                    sprites[uid] = sprite
+                    self.sprites.add(sprite)
+
+    def update(self, state, robot_pos, prime_result):
+        self.sync_entities(state)
+        # El robot se dibuja desde su esquina superior izquierda
+        self.robot.move_to(robot_pos[0], robot_pos[1], anchor='topleft')
+        self.vidas.set_text(f"Vidas: {state.get('vidas', 0)}")
+        self.radiacion.set_text(f"Radiación: {state.get('radiacion', 0):.1f}")
+        self.score.set_text(f"Score: {state.get('score', 0)}")
+        self.prime.set_text(f"Primo: {prime_result}" if prime_result else '')
+        self.game_over.set_text("GAME OVER" if state.get('game_over', False) else '')
+
+    def draw(self):
+        """
+        Pinta lo que cambió y actualiza sólo esas zonas de la ventana.
+        """
+        pygame.display.update(self.sprites.draw(self.screen))
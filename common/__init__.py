@@ -0,0 +1 @@
+# common: código compartido entre cliente y servidor
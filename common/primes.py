@@ -0,0 +1,404 @@
+# common/primes.py
+"""
+Test de primalidad para CHECK_PRIME (servidor del juego y prime_server).
+
+- Números pequeños (< SIEVE_LIMIT): consulta directa a una criba calculada
+  al importar el módulo.
+- Resto: división por los primeros primos para descartar rápido la mayoría
+  de compuestos, y después Miller-Rabin. Por debajo de 2**64 con las bases
+  MR_BASES el resultado es exacto; por encima se usa BPSW (Miller-Rabin en
+  base 2 más Lucas fuerte), para el que no se conoce ningún contraejemplo.
+
+Cada consulta cuesta O(log³ n) en vez del O(√n) de la división por tentativa.
+
+Si existe la tabla de primos (TABLE_PATH, se genera una vez con
+'python common/primes.py [límite]'), los números por debajo de su límite se
+consultan en ella: un bit por impar, abierta con mmap, así que no cuesta
+nada al arrancar y todos los procesos comparten sus páginas. Por encima, las
+últimas respuestas se guardan en una caché LRU (cache) con contadores de
+aciertos y fallos.
+
+Los intervalos [a, b] no se recorren con isprime sino con una criba
+segmentada: sólo los impares, en trozos de SEGMENT_SIZE que caben en la
+caché L1, tachando los múltiplos de los primos base hasta √b.
+"""
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+from collections import OrderedDict
+from itertools import compress
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+TABLE_PATH = os.path.join(ROOT_DIR, '.prime_cache', 'odd_primes.bin')
+
+# Límite por defecto al generar la tabla (256 MiB en disco)
+TABLE_LIMIT = 1 << 32
+
+# Impares por segmento al generar la tabla: segmentos mayores que en las
+# consultas (caben en L2) porque lo que pesa es recorrer los primos base
+TABLE_SEGMENT = 1 << 20
+
+# Cabecera de la tabla: firma y límite (uint64)
+TABLE_MAGIC = b'RBPRIME1'
+TABLE_HEADER = struct.Struct('<8sQ')
+
+# Respuestas que guarda la caché LRU
+CACHE_SIZE = 1 << 16
+
+# Criba de los números menores que este límite: sieve[n] == 1 si n es primo
+SIEVE_LIMIT = 1 << 16
+
+# Primos con los que se prueba la división antes de Miller-Rabin
+TRIAL_PRIMES = 64
+
+# Impares por segmento de la criba (un byte por impar), como mínimo
+SEGMENT_SIZE = 1 << 15
+
+# Primos base de la criba segmentada: con ellos es exacta para b < BASE_LIMIT²;
+# por encima, los que quedan sin tachar se confirman con Miller-Rabin / BPSW
+BASE_LIMIT = 1 << 20
+
+# Bases con las que Miller-Rabin es determinista para n < 2**64 (Sinclair)
+MR_BASES = (2, 325, 9375, 28178, 450775, 9780504, 1795265022)
+
+
+def _build_sieve(limit):
+    sieve = bytearray([1]) * limit
+    sieve[0:2] = b'\x00\x00'
+    for p in range(2, math.isqrt(limit - 1) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = bytes(len(range(p * p, limit, p)))
+    return sieve
+
+
+SIEVE = _build_sieve(SIEVE_LIMIT)
+SMALL_PRIMES = [p for p in range(2, SIEVE_LIMIT) if SIEVE[p]]
+_TRIAL_DIVISORS = tuple(SMALL_PRIMES[:TRIAL_PRIMES])
+
+# Primos impares hasta BASE_LIMIT, calculados la primera vez que se piden
+_base_primes = None
+
+
+def _strong_probable_prime(n, base):
+    """
+    Miller-Rabin con una base: False si 'base' demuestra que n (impar) es
+    compuesto.
+    """
+    base %= n
+    if base == 0:
+        return True
+    d = n - 1
+    s = (d & -d).bit_length() - 1
+    d >>= s
+    x = pow(base, d, n)
+    if x == 1 or x == n - 1:
+        return True
+    for _ in range(s - 1):
+        x = x * x % n
+        if x == n - 1:
+            return True
+    return False
+
+
+def _jacobi(a, n):
+    """
+    Símbolo de Jacobi (a/n) para n impar positivo.
+    """
+    a %= n
+    result = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+
+def _strong_lucas_probable_prime(n):
+    """
+    Test de Lucas fuerte con los parámetros de Selfridge (D = 5, -7, 9, -11...
+    con (D/n) = -1, P = 1, Q = (1 - D) / 4). n es impar y no es un cuadrado.
+    """
+    D = 5
+    while True:
+        j = _jacobi(D, n)
+        if j == -1:
+            break
+        if j == 0 and abs(D) != n:
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+    P, Q = 1, (1 - D) // 4
+
+    # n + 1 = d * 2**s con d impar
+    d = n + 1
+    s = (d & -d).bit_length() - 1
+    d >>= s
+
+    # U_d, V_d y Q^d por duplicación binaria (de izquierda a derecha)
+    U, V, Qk = 1, P, Q
+    for bit in bin(d)[3:]:
+        U, V = U * V % n, (V * V - 2 * Qk) % n
+        Qk = Qk * Qk % n
+        if bit == '1':
+            U, V = P * U + V, D * U + P * V
+            # Dividir entre 2 módulo n (n impar)
+            U = (U + n if U & 1 else U) // 2 % n
+            V = (V + n if V & 1 else V) // 2 % n
+            Qk = Qk * Q % n
+
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1):
+        V = (V * V - 2 * Qk) % n
+        if V == 0:
+            return True
+        Qk = Qk * Qk % n
+    return False
+
+
+def _probable_prime(n):
+    """
+    Miller-Rabin (exacto por debajo de 2**64) o BPSW para n impar y sin
+    divisores pequeños.
+    """
+    if n < 1 << 64:
+        return all(_strong_probable_prime(n, base) for base in MR_BASES)
+    if not _strong_probable_prime(n, 2):
+        return False
+    # Lucas no sirve con cuadrados perfectos (no hay D con (D/n) = -1)
+    root = math.isqrt(n)
+    if root * root == n:
+        return False
+    return _strong_lucas_probable_prime(n)
+
+
+def quick_reject(n):
+    """
+    True si una prueba barata demuestra que n no es primo: es menor que 2 o
+    lo divide alguno de los primeros primos (sin ser ese primo).
+    """
+    if n < 2:
+        return True
+    for p in _TRIAL_DIVISORS:
+        if n % p == 0:
+            return n != p
+    return False
+
+
+def isprime(n):
+    """Determina si n es un número primo."""
+    if n < SIEVE_LIMIT:
+        return n >= 2 and SIEVE[n] == 1
+    table = open_table()
+    if table is not None and n < table.limit:
+        return table.isprime(n)
+    if quick_reject(n):
+        return False
+    result = cache.get(n)
+    if result is None:
+        result = _probable_prime(n)
+        cache.put(n, result)
+    return result
+
+
+class ResultCache:
+    """
+    Últimas respuestas de isprime (LRU, como mucho 'maxsize'), con
+    contadores de aciertos y fallos.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, n):
+        """
+        True o False si n está en la caché; None si no.
+        """
+        with self.lock:
+            result = self.results.get(n)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.results.move_to_end(n)
+            return result
+
+    def put(self, n, result):
+        with self.lock:
+            self.results[n] = result
+            self.results.move_to_end(n)
+            if len(self.results) > self.maxsize:
+                self.results.popitem(last=False)
+
+    def info(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self.results), 'maxsize': self.maxsize}
+
+
+cache = ResultCache()
+
+
+def _odd_base_primes(limit):
+    global _base_primes
+    if limit < SIEVE_LIMIT:
+        return SMALL_PRIMES[1:]
+    if _base_primes is None:
+        sieve = _build_sieve(BASE_LIMIT + 1)
+        _base_primes = list(compress(range(3, BASE_LIMIT + 1, 2), sieve[3::2]))
+    return _base_primes
+
+
+def _odd_segments(a, b, size=SEGMENT_SIZE):
+    """
+    Genera (inicio, segmento) para los impares de [max(a, 3), b]: segmento[i]
+    es 1 si inicio + 2*i no tiene divisores entre los primos base. 'size'
+    es el mínimo de impares por segmento.
+    """
+    lo = max(a, 3) | 1
+    limit = math.isqrt(b)
+    base = _odd_base_primes(limit)
+    # Con √b grande casi ningún primo base cae en un segmento pequeño y el
+    # bucle sobre ellos domina: el segmento crece hasta ~√b impares
+    step = 2 * max(size, min(limit, BASE_LIMIT) // 2)
+    while lo <= b:
+        hi = min(lo + step, b + 1)
+        size = (hi - lo + 1) // 2
+        segment = bytearray([1]) * size
+        for p in base:
+            if p * p >= hi:
+                break
+            # Primer múltiplo impar de p en el segmento (sin tachar el propio p)
+            start = max(p * p, -(-lo // p) * p)
+            if start % 2 == 0:
+                start += p
+            first = (start - lo) // 2
+            segment[first::p] = bytes(len(range(first, size, p)))
+        yield lo, segment
+        lo += 2 * size
+
+
+def prime_segments(a, b):
+    """
+    Genera, trozo a trozo y en orden, las listas de primos de [a, b].
+    """
+    if b < 2 or a > b:
+        return
+    if a <= 2:
+        yield [2]
+    exact = math.isqrt(b) <= BASE_LIMIT
+    for lo, segment in _odd_segments(a, b):
+        primes = list(compress(range(lo, lo + 2 * len(segment), 2), segment))
+        if not exact:
+            # Sin divisores pequeños; no pasan por la caché para no vaciarla
+            primes = [n for n in primes if _probable_prime(n)]
+        if primes:
+            yield primes
+
+
+def count_primes(a, b):
+    """
+    Número de primos en [a, b].
+    """
+    if b < 2 or a > b:
+        return 0
+    if math.isqrt(b) > BASE_LIMIT:
+        return sum(len(primes) for primes in prime_segments(a, b))
+    return (a <= 2) + sum(segment.count(1) for _, segment in _odd_segments(a, b))
+
+
+class PrimeTable:
+    """
+    Tabla de primos en disco: cabecera y un bit por impar (el bit i del
+    byte k es el impar 2*(8*k + i) + 1), leída con mmap.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.limit = TABLE_HEADER.unpack_from(self.map)
+        if magic != TABLE_MAGIC or len(self.map) != TABLE_HEADER.size + self.limit // 16:
+            self.map.close()
+            raise ValueError(f"{path} no es una tabla de primos válida")
+
+    def isprime(self, n):
+        """n < limit."""
+        if n % 2 == 0:
+            return n == 2
+        i = n >> 1
+        return (self.map[TABLE_HEADER.size + (i >> 3)] >> (i & 7)) & 1 == 1
+
+    def close(self):
+        self.map.close()
+
+
+# Tabla abierta (None si no hay); se busca la primera vez que hace falta
+_table = None
+_table_checked = False
+
+
+def open_table(path=TABLE_PATH):
+    """
+    La tabla de primos si existe y es válida, o None.
+    """
+    global _table, _table_checked
+    if not _table_checked:
+        _table_checked = True
+        try:
+            _table = PrimeTable(path)
+        except (OSError, ValueError):
+            _table = None
+    return _table
+
+
+def _pack_bits(flags):
+    """
+    Empaqueta bytes 0/1 (longitud múltiplo de 8) en bits, el primero en el
+    bit menos significativo.
+    """
+    packed = 0
+    for j in range(8):
+        packed |= int.from_bytes(flags[j::8], 'little') << j
+    return packed.to_bytes(len(flags) // 8, 'little')
+
+
+def build_table(limit=TABLE_LIMIT, path=TABLE_PATH):
+    """
+    Genera la tabla de los primos menores que 'limit' (redondeado a un
+    múltiplo de 16) con la criba segmentada. Se escribe en un archivo
+    temporal y se renombra al terminar.
+    """
+    limit = -(-limit // 16) * 16
+    if limit > BASE_LIMIT ** 2:
+        raise ValueError(f"el límite no puede superar {BASE_LIMIT ** 2}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(TABLE_HEADER.pack(TABLE_MAGIC, limit))
+        # El primer bit es el 1, que no es primo; la criba empieza en 3
+        pending = bytearray(1)
+        for count, (lo, segment) in enumerate(_odd_segments(3, limit - 1, TABLE_SEGMENT)):
+            pending += segment
+            whole = len(pending) // 8 * 8
+            f.write(_pack_bits(pending[:whole]))
+            del pending[:whole]
+            if count % 16 == 0:
+                print(f"\r{100 * lo / limit:5.1f} %", end='', flush=True)
+        f.write(_pack_bits(pending))
+    os.replace(tmp, path)
+    print(f"\rTabla hasta {limit} en {path}")
+
+
+if __name__ == '__main__':
+    build_table(int(sys.argv[1]) if len(sys.argv) > 1 else TABLE_LIMIT)
@@ -0,0 +1,368 @@
+# common/protocol.py
+"""
+Protocolo de red del juego.
+
+Al conectar, el cliente envía MAGIC. Si el servidor la reconoce, responde
+con MAGIC y a partir de ahí todos los mensajes van en tramas:
+
+    longitud (uint32, big endian) | tipo (uint8) | payload (longitud bytes)
+
+Los comandos viajan como JSON dentro de una trama MSG_CMD, el estado como
+estructura binaria (MSG_STATE) y las respuestas de texto como UTF-8
+(MSG_TEXT). Tras SUBSCRIBE el servidor envía además, sin que se le pida,
+tramas MSG_PUSH con el mismo formato que MSG_STATE.
+
+Cada estado lleva su número de secuencia y el cliente lo confirma con
+{"cmd": "ACK", "seq": n}. A partir de ahí el servidor manda sólo deltas
+(MSG_DELTA / MSG_PUSH_DELTA) respecto al último estado confirmado, con un
+estado completo (keyframe) periódico. ACK con seq 0 pide un keyframe.
+
+Un comando puede llevar "id" (entero de 32 bits). Entonces el servidor lo
+atiende sin esperar a los anteriores y envía justo antes de su respuesta una
+trama MSG_REPLY_ID con ese id ({"reply_to": id} en modo texto); así el
+cliente puede encadenar peticiones y emparejar las respuestas. Los comandos
+sin "id" se responden en orden, como siempre.
+
+Si la conexión no empieza por MAGIC se usa el modo texto de depuración:
+objetos JSON uno tras otro, y las respuestas en JSON seguido de salto de
+línea (se puede probar con 'nc localhost 5000'); los envíos de la
+suscripción llevan además la clave "push": true y los deltas "delta": true.
+"""
+import codecs
+import json
+import struct
+
+MAGIC = b'RBP1'
+
+HEADER = struct.Struct('!IB')
+MAX_FRAME = 16 * 1024 * 1024
+
+# Tipos de mensaje
+MSG_CMD = 1
+MSG_STATE = 2
+MSG_TEXT = 3
+MSG_PUSH = 4
+MSG_DELTA = 5
+MSG_PUSH_DELTA = 6
+MSG_REPLY_ID = 7
+
+# Campos escalares del estado en binario: (nombre, formato struct)
+FIELDS = (
+    ('x', 'f'),
+    ('y', 'f'),
+    ('radius', 'H'),
+    ('vidas', 'h'),
+    ('score', 'i'),
+    ('radiacion', 'f'),
+    ('flags', 'B'),
+    ('mites_activos', 'I'),
+    ('enemies_activos', 'I'),
+)
+FIELD_STRUCTS = tuple(struct.Struct('!' + fmt) for _, fmt in FIELDS)
+FLAG_GAME_OVER = 0x01
+FLAG_MANUAL = 0x02
+
+# Keyframe: seq + todos los campos. Delta: base, seq y máscara de campos.
+STATE = struct.Struct('!I' + ''.join(fmt for _, fmt in FIELDS))
+DELTA = struct.Struct('!IIH')
+
+# Listas de entidades: contador y después (uid, x, y, kind) o uids
+ENTITY_LISTS = ('mites', 'enemies')
+COUNT = struct.Struct('!I')
+ENTITY = struct.Struct('!IhhB')
+UID = struct.Struct('!I')
+
+# Identificador de petición que precede a la respuesta que le corresponde
+REPLY_ID = struct.Struct('!I')
+
+
+class ProtocolError(Exception):
+    pass
+
+
+# -----------------------------
+# TRAMAS
+# -----------------------------
+def encode_frame(msg_type, payload):
+    return HEADER.pack(len(payload), msg_type) + payload
+
+
+class FrameDecoder:
+    """
+    Decodificador incremental de tramas: se le pasan los bytes según llegan
+    (feed) y retorna las tramas completas, guardando el resto para después.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        buf = self.buffer
+        pos = 0
+        while len(buf) - pos >= HEADER.size:
+            length, msg_type = HEADER.unpack_from(buf, pos)
+            if length > MAX_FRAME:
+                raise ProtocolError(f"Trama demasiado grande: {length} bytes")
+            end = pos + HEADER.size + length
+            if len(buf) < end:
+                break
+            frames.append((msg_type, bytes(buf[pos + HEADER.size:end])))
+            pos = end
+        del buf[:pos]
+        return frames
+
+
+class JsonStreamDecoder:
+    """
+    Decodificador incremental para el modo texto: separa valores JSON
+    consecutivos aunque lleguen juntos o partidos entre varios recv.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, data):
+        try:
+            self.buffer += self._utf8.decode(data)
+        except UnicodeDecodeError as e:
+            raise ProtocolError("UTF-8 inválido") from e
+        values = []
+        pos = 0
+        while True:
+            while pos < len(self.buffer) and self.buffer[pos].isspace():
+                pos += 1
+            if pos >= len(self.buffer):
+                break
+            try:
+                value, pos = self._decoder.raw_decode(self.buffer, pos)
+            except json.JSONDecodeError as e:
+                # Si ya llegó el fin de línea el valor está completo y es inválido;
+                # si no, falta por llegar el resto
+                if '\n' in self.buffer[pos:] or len(self.buffer) - pos > MAX_FRAME:
+                    self.buffer = ''
+                    raise ProtocolError(f"JSON inválido: {e}") from e
+                break
+            values.append(value)
+        self.buffer = self.buffer[pos:]
+        return values
+
+
+# -----------------------------
+# MENSAJES
+# -----------------------------
+def encode_cmd(cmd_dict):
+    return encode_frame(MSG_CMD, json.dumps(cmd_dict).encode('utf-8'))
+
+
+def encode_text(text):
+    return encode_frame(MSG_TEXT, text.encode('utf-8'))
+
+
+def encode_reply_id(req_id):
+    return encode_frame(MSG_REPLY_ID, REPLY_ID.pack(req_id))
+
+
+def _wire_values(data):
+    flags = 0
+    if data['game_over']:
+        flags |= FLAG_GAME_OVER
+    if data['control_mode'] == 'manual':
+        flags |= FLAG_MANUAL
+    return (data['x'], data['y'], data['radius'], data['vidas'], data['score'],
+            data['radiacion'], flags, data['mites_activos'], data['enemies_activos'])
+
+
+def _from_wire(values):
+    """
+    Campos binarios (nombre -> valor) a los del estado, expandiendo 'flags'.
+    """
+    fields = dict(values)
+    if 'flags' in fields:
+        flags = fields.pop('flags')
+        fields['game_over'] = bool(flags & FLAG_GAME_OVER)
+        fields['control_mode'] = 'manual' if flags & FLAG_MANUAL else 'auto'
+    return fields
+
+
+def _pack_entities(entities):
+    parts = [COUNT.pack(len(entities))]
+    for uid, x, y, kind in entities:
+        parts.append(ENTITY.pack(uid, int(x), int(y), kind))
+    return b''.join(parts)
+
+
+def _pack_uids(uids):
+    return COUNT.pack(len(uids)) + b''.join(UID.pack(uid) for uid in uids)
+
+
+def _unpack_entities(payload, pos):
+    (count,) = COUNT.unpack_from(payload, pos)
+    pos += COUNT.size
+    entities = [ENTITY.unpack_from(payload, pos + i * ENTITY.size) for i in range(count)]
+    return entities, pos + count * ENTITY.size
+
+
+def _unpack_uids(payload, pos):
+    (count,) = COUNT.unpack_from(payload, pos)
+    pos += COUNT.size
+    uids = [UID.unpack_from(payload, pos + i * UID.size)[0] for i in range(count)]
+    return uids, pos + count * UID.size
+
+
+def _entity_list(mapping):
+    return [(uid, x, y, kind) for uid, (x, y, kind) in mapping.items()]
+
+
+def state_to_dict(snapshot, entities=None):
+    """
+    Keyframe para el modo texto JSON. 'entities' sustituye a las entidades
+    de la foto (p. ej. sólo las visibles para el cliente).
+    """
+    if entities is None:
+        entities = snapshot.entities
+    data = dict(snapshot.data)
+    data['seq'] = snapshot.seq
+    for name in ENTITY_LISTS:
+        data[name] = _entity_list(entities[name])
+    return data
+
+
+def delta_to_dict(delta):
+    """
+    Delta para el modo texto JSON: sólo los campos que cambian.
+    """
+    base = delta.base.data
+    return {
+        'delta': True,
+        'base': delta.base.seq,
+        'seq': delta.snapshot.seq,
+        'fields': {k: v for k, v in delta.snapshot.data.items() if base.get(k) != v},
+        'spawned': {name: _entity_list(delta.spawned[name]) for name in ENTITY_LISTS},
+        'removed': {name: sorted(delta.removed[name]) for name in ENTITY_LISTS},
+    }
+
+
+def encode_state(snapshot, msg_type=MSG_STATE, entities=None):
+    """
+    Trama MSG_STATE (o MSG_PUSH) con el estado completo en binario compacto.
+    """
+    if entities is None:
+        entities = snapshot.entities
+    parts = [STATE.pack(snapshot.seq, *_wire_values(snapshot.data))]
+    for name in ENTITY_LISTS:
+        parts.append(_pack_entities(_entity_list(entities[name])))
+    return encode_frame(msg_type, b''.join(parts))
+
+
+def encode_delta(delta, msg_type=MSG_DELTA):
+    """
+    Trama MSG_DELTA (o MSG_PUSH_DELTA): máscara con los campos que cambian,
+    sus valores y, por lista, las entidades nuevas y los uids eliminados.
+    """
+    base = _wire_values(delta.base.data)
+    current = _wire_values(delta.snapshot.data)
+    mask = 0
+    values = []
+    for i, (old, new) in enumerate(zip(base, current)):
+        if old != new:
+            mask |= 1 << i
+            values.append(FIELD_STRUCTS[i].pack(new))
+    parts = [DELTA.pack(delta.base.seq, delta.snapshot.seq, mask)] + values
+    for name in ENTITY_LISTS:
+        parts.append(_pack_entities(_entity_list(delta.spawned[name])))
+        parts.append(_pack_uids(sorted(delta.removed[name])))
+    return encode_frame(msg_type, b''.join(parts))
+
+
+def decode_state(payload):
+    values = STATE.unpack_from(payload)
+    data = _from_wire(zip((name for name, _ in FIELDS), values[1:]))
+    data['seq'] = values[0]
+    pos = STATE.size
+    for name in ENTITY_LISTS:
+        data[name], pos = _unpack_entities(payload, pos)
+    return data
+
+
+def decode_delta(payload):
+    base, seq, mask = DELTA.unpack_from(payload)
+    pos = DELTA.size
+    values = {}
+    for i, (name, _) in enumerate(FIELDS):
+        if mask & (1 << i):
+            values[name] = FIELD_STRUCTS[i].unpack_from(payload, pos)[0]
+            pos += FIELD_STRUCTS[i].size
+    spawned, removed = {}, {}
+    for name in ENTITY_LISTS:
+        spawned[name], pos = _unpack_entities(payload, pos)
+        removed[name], pos = _unpack_uids(payload, pos)
+    return {'delta': True, 'base': base, 'seq': seq, 'fields': _from_wire(values),
+            'spawned': spawned, 'removed': removed}
+
+
+class StateTracker:
+    """
+    Reconstruye el estado completo en el cliente a partir de keyframes y
+    deltas. Guarda los últimos estados por seq porque el servidor calcula
+    cada delta respecto al último que se le confirmó, que puede no ser el
+    más reciente. En el estado resultante cada lista de entidades es un
+    dict uid -> (x, y, kind).
+    """
+
+    def __init__(self, keep=64):
+        self.keep = keep
+        self.states = {}
+
+    def apply(self, msg):
+        """
+        Retorna el estado completo, o None si el delta se refiere a una base
+        que ya no se tiene (hay que pedir un keyframe con ACK seq 0).
+        """
+        if msg.get('delta'):
+            base = self.states.get(msg['base'])
+            if base is None:
+                return None
+            state = dict(base)
+            state.update(msg['fields'])
+            state['seq'] = msg['seq']
+            for name in ENTITY_LISTS:
+                spawned = msg['spawned'].get(name, ())
+                removed = msg['removed'].get(name, ())
+                if spawned or removed:
+                    entities = dict(base[name])
+                    for uid, x, y, kind in spawned:
+                        entities[uid] = (x, y, kind)
+                    for uid in removed:
+                        entities.pop(uid, None)
+                    state[name] = entities
+        else:
+            state = dict(msg)
+            for name in ENTITY_LISTS:
+                state[name] = {uid: (x, y, kind) for uid, x, y, kind in msg.get(name, ())}
+
+        seq = state['seq']
+        self.states[seq] = state
+        for old in [s for s in self.states if s <= seq - self.keep]:
+            del self.states[old]
+        return state
+
+
+def decode_message(msg_type, payload):
+    """
+    Convierte una trama recibida en el valor que ve la aplicación.
+    """
+    if msg_type == MSG_CMD:
+        return json.loads(payload.decode('utf-8'))
+    if msg_type in (MSG_STATE, MSG_PUSH):
+        return decode_state(payload)
+    if msg_type in (MSG_DELTA, MSG_PUSH_DELTA):
+        return decode_delta(payload)
+    if msg_type == MSG_TEXT:
+        return payload.decode('utf-8')
+    if msg_type == MSG_REPLY_ID:
+        return {'reply_to': REPLY_ID.unpack(payload)[0]}
+    raise ProtocolError(f"Tipo de mensaje desconocido: {msg_type}")
@@ -0,0 +1,98 @@
+# common/world.py
+"""
+Geometría del laboratorio y reglas de movimiento del robot.
+
+Las usan el servidor (simulación autoritativa) y el cliente (predicción del
+movimiento manual), así que ambos avanzan el robot exactamente igual.
+"""
+
+# Geometría del laboratorio (no cambia durante la partida)
+WINDOW_WIDTH = 600
+WINDOW_HEIGHT = 800
+HUECO_RECT = (151, 280, 89, 260)
+BARRERA = (50, 130, 550, 760)
+ROBOT_RADIUS = 10
+
+# Zonas contaminadas: tamaño (ancho, alto) y esquina superior izquierda
+ZONAS = {
+    'Zona 1': (500, 150),
+    'Zona 2': (101, 480),
+    'Zona 3': (309, 480),
+    'Zona 4': (90, 220)
+}
+ZONA_OFFSETS = {
+    'Zona 1': (50, 130),
+    'Zona 2': (50, 280),
+    'Zona 3': (240, 280),
+    'Zona 4': (151, 540),
+}
+
+# Tipos de virus y enemigos (columna 'kind' del servidor y del protocolo)
+KIND_WHITE = 0
+KIND_GREEN = 1
+KIND_RED = 2
+KIND_COLORS = ('white', 'green', 'red')
+
+# Segundos simulados por tick
+TICK = 0.1
+
+# Control manual: direcciones (dx, dy) y velocidad con una tecla mantenida
+DIRECTIONS = {'UP': (0, -1), 'DOWN': (0, 1), 'LEFT': (-1, 0), 'RIGHT': (1, 0)}
+MANUAL_SPEED = 5  # píxeles por tick
+
+
+def in_barrera(x, y, r):
+    min_x, min_y, max_x, max_y = BARRERA
+    return (x - r >= min_x and x + r < max_x and
+            y - r >= min_y and y + r < max_y)
+
+
+def in_hueco(x, y, r):
+    hx, hy, hw, hh = HUECO_RECT
+    closest_x = max(hx, min(x, hx+hw))
+    closest_y = max(hy, min(y, hy+hh))
+    dist_sq = (x - closest_x)**2 + (y - closest_y)**2
+    return dist_sq < (r*r)
+
+
+def can_stand(x, y, r=ROBOT_RADIUS):
+    """
+    True si el robot cabe en (x, y): dentro de la barrera y fuera del hueco.
+    """
+    return in_barrera(x, y, r) and not in_hueco(x, y, r)
+
+
+def slide(x, y, dx, dy, r=ROBOT_RADIUS):
+    """
+    Posición tras desplazar (dx, dy) sin atravesar paredes. Cada eje se
+    prueba por separado, así el robot se desliza a lo largo de la pared.
+    Si ya estaba en un sitio no válido se le deja salir.
+    """
+    stuck = not can_stand(x, y, r)
+    if dx and (stuck or can_stand(x + dx, y, r)):
+        x += dx
+    if dy and (stuck or can_stand(x, y + dy, r)):
+        y += dy
+    return x, y
+
+
+def input_direction(keys):
+    """
+    Dirección (dx, dy) de un conjunto de teclas pulsadas, con componentes
+    -1, 0 o 1.
+    """
+    dx = sum(DIRECTIONS[k][0] for k in keys if k in DIRECTIONS)
+    dy = sum(DIRECTIONS[k][1] for k in keys if k in DIRECTIONS)
+    return dx, dy
+
+
+def manual_step(x, y, keys, r=ROBOT_RADIUS):
+    """
+    Posición tras un tick de control manual con 'keys' pulsadas (en
+    diagonal, a la misma velocidad).
+    """
+    dx, dy = input_direction(keys)
+    if not (dx or dy):
+        return x, y
+    speed = MANUAL_SPEED if not (dx and dy) else MANUAL_SPEED / 2 ** 0.5
+    return slide(x, y, dx * speed, dy * speed, r)
@@ -1,26 +1,196 @@
 # main_principal.py
+import json
+import os
+import socket
 import subprocess
+import sys
 import time
 
+HOST = '127.0.0.1'
+PORT = 5000
+
+# Los hijos se lanzan desde la raíz del proyecto, se ejecute desde donde se ejecute
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Espera máxima a que el servidor responda a PING
+READY_TIMEOUT = 30.0
+
+# Reintentos tras una caída: espera inicial, máxima, y tiempo en marcha a
+# partir del cual se considera estable y la espera vuelve a la inicial
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 10.0
+STABLE_AFTER = 30.0
+
+
+def ping(host=HOST, port=PORT, timeout=1.0):
+    """
+    pid del servidor que responde a PING (modo texto), o None.
+    """
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(json.dumps({'cmd': 'PING'}).encode('utf-8'))
+            data = b''
+            while not data.endswith(b'\n'):
+                chunk = sock.recv(64)
+                if not chunk:
+                    break
+                data += chunk
+            reply = json.loads(data or b'null')
+            if isinstance(reply, str) and reply.startswith("PONG "):
+                return int(reply.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def wait_ready(proc, timeout=READY_TIMEOUT):
+    """
+    Espera a que el servidor esté listo; False si muere o no llega a tiempo.
+    Sólo vale la respuesta de ese proceso (otro podría ocupar el puerto).
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            return False
+        if ping() == proc.pid:
+            return True
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+    return False
+
+
+class Child:
+    """
+    Proceso hijo que el supervisor relanza si termina con error, esperando
+    cada vez más entre intentos (hasta BACKOFF_MAX).
+    """
+
+    def __init__(self, name, args, restart=True):
+        self.name = name
+        self.args = args
+        self.restart = restart
+        self.proc = None
+        self.started = 0.0
+        self.backoff = BACKOFF_INITIAL
+        self.retry_at = None
+
+    def start(self):
+        print(f"[MAIN] Iniciando {self.name}...")
+        self.proc = subprocess.Popen([sys.executable] + self.args, cwd=ROOT_DIR)
+        self.started = time.monotonic()
+        self.retry_at = None
+
+    def check(self):
+        """
+        Retorna 'running', 'done' (terminó bien o no se relanza), 'restarted'
+        o 'waiting' (caído, esperando para relanzar).
+        """
+        now = time.monotonic()
+        if self.retry_at is not None:
+            if now < self.retry_at:
+                return 'waiting'
+            self.start()
+            return 'restarted'
+        code = self.proc.poll()
+        if code is None:
+            return 'running'
+        if code == 0 or not self.restart:
+            return 'done'
+        if now - self.started >= STABLE_AFTER:
+            self.backoff = BACKOFF_INITIAL
+        print(f"[MAIN] {self.name} terminó con código {code}; se relanza en {self.backoff:.1f} s")
+        self.retry_at = now + self.backoff
+        self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+        return 'waiting'
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+
+
+def supervise(control_mode, headless=0, gui=True, duration=0):
+    """
+    Lanza el servidor, espera a que responda a PING y después el cliente
+    gráfico y 'headless' clientes sin ventana. Relanza lo que se caiga.
+    Termina al cerrar el cliente gráfico o, sin él, tras 'duration'
+    segundos (0: hasta Ctrl+C).
+    """
+    server = Child("el servidor de RoomBA", ["server/main_server.py", control_mode])
+    clients = []
+    if gui:
+        # Si pierde la conexión sale con error y se relanza; al cerrar la
+        # ventana sale con 0 y termina todo
+        clients.append(Child("el cliente de RoomBA", ["client/main_client.py"]))
+    for i in range(headless):
+        clients.append(Child(f"el cliente sin ventana {i + 1}", ["client/headless_client.py"]))
+
+    start = time.monotonic()
+    try:
+        server.start()
+        while not wait_ready(server.proc):
+            if server.check() == 'done':
+                print("[MAIN] El servidor no arrancó.")
+                return
+            while server.check() == 'waiting':
+                time.sleep(0.1)
+        print("[MAIN] Servidor listo.")
+        for client in clients:
+            client.start()
+
+        while True:
+            time.sleep(0.2)
+            status = server.check()
+            if status == 'done':
+                print("[MAIN] El servidor ha finalizado.")
+                return
+            if status == 'restarted':
+                if not wait_ready(server.proc):
+                    continue
+                print("[MAIN] Servidor listo.")
+            if status != 'running':
+                continue
+            for client in clients:
+                if client.check() == 'done' and client is clients[0] and gui:
+                    print("[MAIN] El cliente ha finalizado.")
+                    return
+            if duration and time.monotonic() - start >= duration:
+                return
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for client in clients:
+            client.stop()
+        print("[MAIN] Terminando el servidor...")
+        server.stop()
+        print("[MAIN] El servidor ha finalizado.")
+
+
 def main():
     # Definir el modo deseado: "manual" o "auto"
     control_mode = "manual"  # Puedes cambiar a "auto" si lo deseas
 
-    print("[MAIN] Iniciando el servidor de RoomBA...")
-    server_proc = subprocess.Popen(["python", "server/main_server.py", control_mode])
-    
-    # Esperar suficiente tiempo para que el servidor se inicie
-    time.sleep(5)
-    
-    print("[MAIN] Iniciando el cliente de RoomBA...")
-    client_proc = subprocess.Popen(["python", "client/main_client.py"])
-    client_proc.wait()
-    print("[MAIN] El cliente ha finalizado.")
-
-    print("[MAIN] Terminando el servidor...")
-    server_proc.terminate()
-    server_proc.wait()
-    print("[MAIN] El servidor ha finalizado.")
+    # Opciones para pruebas de carga:
+    #   --headless N   lanza N clientes sin ventana
+    #   --no-gui       no lanza el cliente gráfico
+    #   --duration S   sin cliente gráfico, termina a los S segundos
+    args = sys.argv[1:]
+    def option(name, default):
+        if name in args:
+            return type(default)(args[args.index(name) + 1])
+        return default
+    if args and args[0] in ('manual', 'auto'):
+        control_mode = args[0]
+
+    supervise(control_mode,
+              headless=option('--headless', 0),
+              gui='--no-gui' not in args,
+              duration=option('--duration', 0.0))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
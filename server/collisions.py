@@ -0,0 +1,74 @@
+# server/collisions.py
+import numpy as np
+
+from common.world import KIND_GREEN
+
+MITE_MARGIN = 3      # radio extra para comerse un virus
+ENEMY_MARGIN = 10    # radio extra para chocar con un enemigo
+
+
+def batch_collisions(robots, store, margin):
+    """
+    Prueba todos los robots contra todas las entidades de 'store' en una sola
+    pasada vectorizada sobre sus columnas de coordenadas.
+
+    robots: array (N, 3) con (x, y, radius) de cada robot.
+    Retorna (slots, owner): los slots activos tocados por algún robot y, para
+    cada uno, el índice del primer robot que lo toca.
+
+    Las columnas se leen con np.frombuffer (sin copia); las vistas no deben
+    sobrevivir a la llamada, porque el array no puede crecer mientras existan.
+    """
+    n = store.capacity
+    if n == 0 or store.live == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    xs = np.frombuffer(store.x, dtype=np.float64, count=n)
+    ys = np.frombuffer(store.y, dtype=np.float64, count=n)
+    active = np.frombuffer(store.active, dtype=np.uint8, count=n).astype(bool)
+
+    dx = xs[np.newaxis, :] - robots[:, 0:1]
+    dy = ys[np.newaxis, :] - robots[:, 1:2]
+    reach = robots[:, 2:3] + margin
+    hit = (dx*dx + dy*dy < reach*reach) & active
+
+    slots = np.flatnonzero(hit.any(axis=0))
+    owner = hit[:, slots].argmax(axis=0)
+    return slots, owner
+
+
+def resolve_collisions(game_state, robots):
+    """
+    Aplica las colisiones de varios robots a la vez (con el lock tomado):
+    suma puntos y baja la radiación por los virus comidos, y resta vidas
+    por los enemigos tocados. Retorna, por robot, (virus, enemigos) tocados.
+    """
+    robots = np.asarray(robots, dtype=np.float64).reshape(-1, 3)
+    state = game_state.state
+    mites = game_state.shared_mites
+    enemies = game_state.shared_enemies
+
+    mite_slots, mite_owner = batch_collisions(robots, mites, MITE_MARGIN)
+    enemy_slots, enemy_owner = batch_collisions(robots, enemies, ENEMY_MARGIN)
+
+    if len(mite_slots):
+        kinds = np.frombuffer(mites.kind, dtype=np.uint8, count=mites.capacity)[mite_slots]
+        greens = int(np.count_nonzero(kinds == KIND_GREEN))
+        state['score'] += 10 * len(mite_slots)
+        # Cada virus verde reduce la radiación un 10%
+        if greens:
+            state['radiacion'] *= 0.9 ** greens
+        for slot in mite_slots.tolist():
+            mites.kill(slot)
+
+    if len(enemy_slots):
+        for slot in enemy_slots.tolist():
+            enemies.kill(slot)
+        state['vidas'] -= len(enemy_slots)
+        if state['vidas'] <= 0:
+            state['vidas'] = 0
+            state['game_over'] = True
+
+    count = len(robots)
+    return list(zip(np.bincount(mite_owner, minlength=count).tolist(),
+                    np.bincount(enemy_owner, minlength=count).tolist()))
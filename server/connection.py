@@ -0,0 +1,265 @@
+# server/connection.py
+import asyncio
+import json
+
+from game_state import Snapshot
+from common.protocol import (MAGIC, MSG_STATE, MSG_PUSH, MSG_DELTA, MSG_PUSH_DELTA,
+                             FrameDecoder, JsonStreamDecoder, decode_message,
+                             delta_to_dict, encode_delta, encode_reply_id, encode_state,
+                             encode_text, state_to_dict)
+
+# Respuestas pendientes de enviar por conexión antes de dejar de leer comandos
+SEND_QUEUE = 64
+
+# Comandos con id que se atienden a la vez por conexión
+MAX_INFLIGHT = 64
+
+# Cada cuántas secuencias se manda un estado completo aunque haya base
+KEYFRAME_EVERY = 100
+
+
+class ClientConnection:
+    """
+    Una conexión de cliente dentro del bucle asyncio del servidor.
+
+    Tiene dos tareas: la lectora decodifica comandos y los pasa a
+    GameServer.dispatch, y la escritora vacía la cola de respuestas (acotada:
+    si se llena, la lectora espera) y el último estado de la suscripción.
+    Los envíos de la suscripción no se acumulan: si el cliente va lento,
+    cada foto nueva sustituye a la que aún no se había enviado.
+    """
+
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.addr = writer.get_extra_info('peername')
+        self.framed = False
+
+        self.replies = asyncio.Queue(SEND_QUEUE)
+        self.wakeup = asyncio.Event()
+        self.closing = False
+
+        # Comandos con id en curso (se atienden sin esperar a los anteriores)
+        self.tasks = set()
+        self.inflight = asyncio.Semaphore(MAX_INFLIGHT)
+
+        # Suscripción
+        self.on_change = True
+        self.pending_push = None
+        self.last_pushed = None
+
+        # Deltas: último seq confirmado por el cliente (ACK) y último keyframe
+        self.acked_seq = 0
+        self.keyframe_seq = 0
+        # Primer keyframe con la vista actual; los ACK anteriores no sirven
+        # de base (None: aún no se ha enviado)
+        self.view_seq = 0
+
+        # Vista (x0, y0, x1, y1) a la que se limitan las entidades, o None
+        self.view = None
+
+    async def run(self):
+        print(f"[Server] Cliente conectado: {self.addr}")
+        writer_task = asyncio.create_task(self.writer_loop())
+        exited = False
+        try:
+            exited = await self.reader_loop()
+        except Exception as e:
+            # Cualquier fallo (trama mal formada, comando con tipos
+            # inesperados...) cierra sólo esta conexión
+            print(f"[Server] Error con el cliente {self.addr}: {e!r}")
+        finally:
+            self.server.unsubscribe(self)
+            self.server.release_keys(self)
+            if self.tasks:
+                # Tras EXIT se entregan las respuestas pendientes; si la
+                # conexión se perdió no hay a quién, y se cancelan
+                if not exited:
+                    for task in self.tasks:
+                        task.cancel()
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+            # Enviar lo pendiente antes de cerrar
+            self.closing = True
+            self.wakeup.set()
+            try:
+                await writer_task
+            except ConnectionError:
+                pass
+            self.writer.close()
+            print(f"[Server] Cliente desconectado: {self.addr}")
+
+    # -----------------------------
+    # LECTURA
+    # -----------------------------
+    async def negotiate(self):
+        """
+        Lee el inicio de la conexión y retorna los datos ya leídos tras MAGIC.
+        Deja self.framed a True si el cliente abrió con MAGIC.
+        """
+        data = b''
+        while len(data) < len(MAGIC) and MAGIC.startswith(data):
+            chunk = await self.reader.read(4096)
+            if not chunk:
+                break
+            data += chunk
+        if data.startswith(MAGIC):
+            self.framed = True
+            self.writer.write(MAGIC)
+            return data[len(MAGIC):]
+        return data
+
+    async def reader_loop(self):
+        """
+        Lee y atiende comandos. Retorna True si el cliente se despidió con
+        EXIT y False si cerró la conexión.
+        """
+        data = await self.negotiate()
+        # Sin MAGIC: modo texto JSON (depuración)
+        decoder = FrameDecoder() if self.framed else JsonStreamDecoder()
+
+        while True:
+            for item in decoder.feed(data):
+                msg = decode_message(*item) if self.framed else item
+                if not isinstance(msg, dict):
+                    continue
+                if msg.get('cmd') == 'EXIT':
+                    return True
+                req_id = msg.get('id')
+                if isinstance(req_id, int) and 0 <= req_id < 2**32:
+                    await self.inflight.acquire()
+                    task = asyncio.create_task(self.handle_tagged(msg, req_id))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+                else:
+                    await self.handle(msg)
+            data = await self.reader.read(4096)
+            if not data:
+                return False
+
+    async def handle(self, msg):
+        reply = await self.server.dispatch(self, msg)
+        if reply is not None:
+            await self.send(self.encode_reply(reply))
+
+    async def handle_tagged(self, msg, req_id):
+        """
+        Atiende un comando con id; la respuesta va precedida de su id. Si
+        falla, se responde con el error para que el cliente no espere.
+        """
+        try:
+            reply = await self.server.dispatch(self, msg)
+            if reply is not None:
+                await self.send(self.encode_reply_id(req_id), self.encode_reply(reply))
+        except ConnectionError as e:
+            print(f"[Server] Error con el cliente {self.addr}: {e}")
+        except Exception as e:
+            print(f"[Server] Error con el cliente {self.addr}: {e!r}")
+            await self.send(self.encode_reply_id(req_id), self.encode_reply(f"Error: {e}"))
+        finally:
+            self.inflight.release()
+
+    def ack(self, seq):
+        """
+        Confirma el estado 'seq' como base de los próximos deltas (0: pedir
+        un keyframe).
+        """
+        if seq and (self.view_seq is None or seq < self.view_seq):
+            return
+        self.acked_seq = seq
+
+    def set_view(self, view):
+        """
+        Limita las entidades enviadas a la vista (None: todas). Lo enviado
+        hasta ahora no vale como base, así que se fuerza un keyframe.
+        """
+        self.view = view
+        self.acked_seq = 0
+        self.view_seq = None
+
+    # -----------------------------
+    # ESCRITURA
+    # -----------------------------
+    async def send(self, *parts):
+        # Las partes de una respuesta se escriben juntas
+        await self.replies.put(parts)
+        self.wakeup.set()
+
+    def push(self, snapshot):
+        """
+        Ofrece una foto nueva a la suscripción (desde el bucle de eventos).
+        """
+        if self.on_change and self.last_pushed is not None and snapshot.same_as(self.last_pushed):
+            return
+        self.pending_push = snapshot
+        self.last_pushed = snapshot
+        self.wakeup.set()
+
+    async def writer_loop(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while not self.replies.empty():
+                self.writer.writelines(self.replies.get_nowait())
+            if self.pending_push is not None:
+                self.writer.write(self.encode_push(self.pending_push))
+                self.pending_push = None
+            await self.writer.drain()
+            if self.closing and self.replies.empty() and self.pending_push is None:
+                return
+
+    def encode_reply_id(self, req_id):
+        if self.framed:
+            return encode_reply_id(req_id)
+        return (json.dumps({'reply_to': req_id}) + '\n').encode('utf-8')
+
+    def encode_reply(self, reply):
+        if isinstance(reply, Snapshot):
+            return self.encode_snapshot(reply, push=False)
+        if self.framed:
+            return encode_text(reply)
+        return (json.dumps(reply) + '\n').encode('utf-8')
+
+    def encode_push(self, snapshot):
+        return self.encode_snapshot(snapshot, push=True)
+
+    def encode_snapshot(self, snapshot, push):
+        """
+        Delta respecto al último estado confirmado por el cliente, o un
+        keyframe si no hay base utilizable o toca el keyframe periódico.
+        Cada codificación se hace una sola vez por foto y se comparte entre
+        todos los clientes con la misma base y el mismo modo.
+        """
+        base_seq = 0
+        if self.acked_seq and snapshot.seq - self.keyframe_seq < KEYFRAME_EVERY:
+            base_seq = self.acked_seq
+
+        key = (base_seq, push, self.framed, self.view)
+        cached = snapshot.encoded.get(key)
+        if cached is None:
+            cached = snapshot.encoded[key] = self._encode(snapshot, base_seq, push)
+        keyframe, data = cached
+        if keyframe:
+            self.keyframe_seq = snapshot.seq
+            if self.view_seq is None:
+                self.view_seq = snapshot.seq
+        return data
+
+    def _encode(self, snapshot, base_seq, push):
+        """
+        Retorna (es_keyframe, bytes).
+        """
+        view = self.view
+        delta = self.server.game_state.delta(base_seq, snapshot, view) if base_seq else None
+        if delta is None:
+            entities = snapshot.visible(view) if view is not None else None
+            if self.framed:
+                return True, encode_state(snapshot, MSG_PUSH if push else MSG_STATE, entities)
+            data = state_to_dict(snapshot, entities)
+        else:
+            if self.framed:
+                return False, encode_delta(delta, MSG_PUSH_DELTA if push else MSG_DELTA)
+            data = delta_to_dict(delta)
+        if push:
+            data['push'] = True
+        return delta is None, (json.dumps(data) + '\n').encode('utf-8')
@@ -0,0 +1,102 @@
+# server/entity_store.py
+from array import array
+
+
+class EntityStore:
+    """
+    Almacén de entidades en columnas paralelas (struct-of-arrays).
+
+    Cada entidad ocupa un 'slot': x[slot], y[slot], kind[slot], active[slot]
+    y uid[slot] (identificador único que no se repite aunque el slot se
+    reutilice). Los slots de entidades muertas van a una lista libre y se
+    reciclan en el siguiente spawn, así la memoria no crece con el histórico.
+    Las colisiones recorren las columnas con NumPy (ver collisions.py).
+    """
+
+    def __init__(self):
+        self.x = array('d')
+        self.y = array('d')
+        self.kind = array('B')
+        self.active = bytearray()
+        self.uid = array('q')
+
+        self.free = []
+        self.live = 0
+        self._next_uid = 1
+
+        # Altas (uid, x, y, kind) y bajas (uid) desde la última publicación
+        self.spawned = []
+        self.removed = []
+
+        # Diarios de cambios de otros consumidores (ver open_journal)
+        self.journals = []
+
+    def __len__(self):
+        return self.live
+
+    @property
+    def capacity(self):
+        return len(self.active)
+
+    def spawn(self, x, y, kind):
+        """
+        Da de alta una entidad y retorna su slot.
+        """
+        uid = self._next_uid
+        self._next_uid += 1
+        if self.free:
+            slot = self.free.pop()
+            self.x[slot] = x
+            self.y[slot] = y
+            self.kind[slot] = kind
+            self.active[slot] = 1
+            self.uid[slot] = uid
+        else:
+            slot = len(self.active)
+            self.x.append(x)
+            self.y.append(y)
+            self.kind.append(kind)
+            self.active.append(1)
+            self.uid.append(uid)
+        self.live += 1
+        self.spawned.append((uid, x, y, kind))
+        for journal in self.journals:
+            journal.append((uid, x, y))
+        return slot
+
+    def kill(self, slot):
+        """
+        Da de baja la entidad del slot y lo deja libre para reutilizarlo.
+        """
+        if not self.active[slot]:
+            return
+        self.active[slot] = 0
+        self.live -= 1
+        self.free.append(slot)
+        self.removed.append(self.uid[slot])
+        for journal in self.journals:
+            journal.append((self.uid[slot], None, None))
+
+    def drain_changes(self):
+        """
+        Retorna (altas, bajas) desde la llamada anterior y las olvida.
+        """
+        spawned, removed = tuple(self.spawned), tuple(self.removed)
+        self.spawned.clear()
+        self.removed.clear()
+        return spawned, removed
+
+    def open_journal(self):
+        """
+        Abre un diario de cambios independiente de la publicación: una lista
+        a la que se añaden, en orden, las altas (uid, x, y) y las bajas
+        (uid, None, None). Empieza con las entidades ya vivas y la vacía
+        quien la lee.
+        """
+        journal = [(self.uid[slot], self.x[slot], self.y[slot]) for slot in self.live_slots()]
+        self.journals.append(journal)
+        return journal
+
+    def live_slots(self):
+        active = self.active
+        return [slot for slot in range(len(active)) if active[slot]]
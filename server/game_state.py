@@ -1,5 +1,98 @@
 # server/game_state.py
 import threading
+from types import MappingProxyType
+
+from entity_store import EntityStore
+from common.world import WINDOW_WIDTH, WINDOW_HEIGHT, DIRECTIONS, ZONAS, ZONA_OFFSETS, slide
+
+
+# Listas de entidades que viajan en el estado
+ENTITY_LISTS = ('mites', 'enemies')
+
+# Fotos recientes que se conservan para calcular deltas
+HISTORY = 64
+
+# Tamaño de las celdas con las que se indexan las entidades de cada foto
+VIEW_CELL = 32
+
+
+def clamp_view(rect):
+    """
+    Normaliza un rectángulo de vista (x, y, ancho, alto) a (x0, y0, x1, y1)
+    recortado a la ventana del juego.
+    """
+    x, y, w, h = (float(v) for v in rect)
+    return (max(0.0, min(x, x + w)), max(0.0, min(y, y + h)),
+            min(float(WINDOW_WIDTH), max(x, x + w)), min(float(WINDOW_HEIGHT), max(y, y + h)))
+
+
+def _in_view(view, x, y):
+    return view[0] <= x <= view[2] and view[1] <= y <= view[3]
+
+
+class Snapshot:
+    """
+    Foto inmutable del estado publicada por la simulación.
+    'seq' crece en cada publicación; 'data' (campos escalares) es de sólo
+    lectura. 'entities' guarda, por lista, uid -> (x, y, kind) de las
+    entidades vivas; 'spawned' y 'removed' las altas y bajas de este tick.
+    'cells' indexa los uids de cada lista por celda de VIEW_CELL píxeles
+    para las consultas por rectángulo. 'encoded' guarda los bytes ya
+    serializados de la foto para reutilizarlos con todos los clientes (lo
+    rellena y lee sólo el bucle asyncio).
+    """
+    __slots__ = ('seq', 'data', 'entities', 'cells', 'spawned', 'removed', 'encoded')
+
+    def __init__(self, seq, data, entities, cells, spawned, removed):
+        self.seq = seq
+        self.data = MappingProxyType(data)
+        self.entities = entities
+        self.cells = cells
+        self.spawned = spawned
+        self.removed = removed
+        self.encoded = {}
+
+    def same_as(self, other):
+        """
+        True si no hay ningún cambio visible respecto a 'other'.
+        """
+        return self.entities is other.entities and self.data == other.data
+
+    def visible(self, view):
+        """
+        Entidades dentro de la vista (x0, y0, x1, y1), por lista. Sólo se
+        recorren las celdas que toca el rectángulo.
+        """
+        x0, y0, x1, y1 = view
+        result = {}
+        for name in ENTITY_LISTS:
+            live = self.entities[name]
+            cells = self.cells[name]
+            found = {}
+            for cx in range(int(x0 // VIEW_CELL), int(x1 // VIEW_CELL) + 1):
+                for cy in range(int(y0 // VIEW_CELL), int(y1 // VIEW_CELL) + 1):
+                    for uid in cells.get((cx, cy), ()):
+                        entity = live[uid]
+                        if _in_view(view, entity[0], entity[1]):
+                            found[uid] = entity
+            result[name] = found
+        return result
+
+
+class Delta:
+    """
+    Diferencia entre dos fotos: los campos escalares se comparan al
+    codificar; 'spawned' (uid -> (x, y, kind)) y 'removed' (uids) acumulan,
+    por lista, las altas y bajas de los ticks intermedios.
+    """
+    __slots__ = ('base', 'snapshot', 'spawned', 'removed')
+
+    def __init__(self, base, snapshot, spawned, removed):
+        self.base = base
+        self.snapshot = snapshot
+        self.spawned = spawned
+        self.removed = removed
+
 
 class GameState:
     def __init__(self):
@@ -16,54 +109,181 @@ class GameState:
             'radiacion': 10       # Se inicializa la radiación en 10 (valor ajustable)
         }
 
-        # Zonas y offsets (puedes ajustarlos según necesites)
-        self.zonas = {
-            'Zona 1': (500, 150),
-            'Zona 2': (101, 480),
-            'Zona 3': (309, 480),
-            'Zona 4': (90, 220)
-        }
-        self.zona_offsets = {
-            'Zona 1': (50, 130),
-            'Zona 2': (50, 280),
-            'Zona 3': (240, 280),
-            'Zona 4': (151, 540),
-        }
+        # Zonas y offsets (se definen en common/world.py, el cliente las dibuja)
+        self.zonas = dict(ZONAS)
+        self.zona_offsets = dict(ZONA_OFFSETS)
 
-        # Listas compartidas de virus y enemigos
-        self.shared_mites = []
-        self.shared_enemies = []
+        # Almacenes compartidos de virus y enemigos (slots reciclables)
+        self.shared_mites = EntityStore()
+        self.shared_enemies = EntityStore()
 
         # Para cálculo de áreas
         self.areas_result = {}
 
-        # Lock para sincronizar accesos
+        # Teclas de dirección pulsadas en modo manual, por cliente
+        self.held_keys = {}
+
+        # Lock para sincronizar accesos (sólo escritores)
         self.lock = threading.Lock()
 
+        # Última foto publicada; los lectores la leen sin tomar el lock
+        self.seq = 0
+        self.snapshot = None
+        # seq -> Snapshot de las últimas HISTORY fotos (para los deltas)
+        self.history = {}
+        # Funciones a las que se pasa cada foto nueva (desde publish)
+        self.listeners = []
+        with self.lock:
+            self.publish()
+
+    def publish(self):
+        """
+        Publica una nueva foto del estado (llamar con el lock tomado).
+        El cambio de referencia es atómico, así que los lectores ven siempre
+        una foto completa, la anterior o la nueva.
+        """
+        data = dict(self.state)
+        # Conteo de virus y enemigos activos (contadores del almacén, O(1))
+        data['mites_activos'] = self.shared_mites.live
+        data['enemies_activos'] = self.shared_enemies.live
+
+        # Entidades: el diccionario sólo se copia si hubo altas o bajas
+        # (lo mismo con las celdas: sólo se copian las que cambian)
+        if self.snapshot:
+            prev, prev_cells = self.snapshot.entities, self.snapshot.cells
+        else:
+            prev = prev_cells = {name: {} for name in ENTITY_LISTS}
+        entities, cells, spawned, removed = {}, {}, {}, {}
+        for name, store in (('mites', self.shared_mites), ('enemies', self.shared_enemies)):
+            spawned[name], removed[name] = store.drain_changes()
+            if spawned[name] or removed[name]:
+                live = dict(prev[name])
+                buckets = dict(prev_cells[name])
+                for uid, x, y, kind in spawned[name]:
+                    live[uid] = (x, y, kind)
+                    cell = (int(x // VIEW_CELL), int(y // VIEW_CELL))
+                    buckets[cell] = buckets.get(cell, ()) + (uid,)
+                for uid in removed[name]:
+                    entity = live.pop(uid, None)
+                    if entity is not None:
+                        cell = (int(entity[0] // VIEW_CELL), int(entity[1] // VIEW_CELL))
+                        rest = tuple(u for u in buckets[cell] if u != uid)
+                        if rest:
+                            buckets[cell] = rest
+                        else:
+                            del buckets[cell]
+                entities[name] = MappingProxyType(live)
+                cells[name] = buckets
+            else:
+                entities[name] = prev[name]
+                cells[name] = prev_cells[name]
+        if all(entities[name] is prev[name] for name in ENTITY_LISTS):
+            entities, cells = prev, prev_cells
+
+        self.seq += 1
+        self.snapshot = Snapshot(self.seq, data, entities, cells, spawned, removed)
+        self.history[self.seq] = self.snapshot
+        self.history.pop(self.seq - HISTORY, None)
+        # Los listeners se llaman con el lock tomado: deben ser rápidos
+        for listener in self.listeners:
+            listener(self.snapshot)
+
+    def delta(self, base_seq, snapshot, view=None):
+        """
+        Delta desde la foto 'base_seq' hasta 'snapshot', o None si la base ya
+        no está en el historial. Con 'view' (x0, y0, x1, y1) sólo incluye las
+        entidades dentro de la vista. Se puede llamar sin el lock.
+        """
+        base = self.history.get(base_seq)
+        if base is None or base_seq > snapshot.seq:
+            return None
+        spawned = {name: {} for name in ENTITY_LISTS}
+        removed = {name: set() for name in ENTITY_LISTS}
+        for seq in range(base_seq + 1, snapshot.seq + 1):
+            snap = snapshot if seq == snapshot.seq else self.history.get(seq)
+            if snap is None:
+                return None
+            for name in ENTITY_LISTS:
+                for uid, x, y, kind in snap.spawned[name]:
+                    spawned[name][uid] = (x, y, kind)
+                for uid in snap.removed[name]:
+                    # Si nació y murió dentro del intervalo, no se envía nada
+                    if spawned[name].pop(uid, None) is None:
+                        removed[name].add(uid)
+        if view is not None:
+            # Las entidades no se mueven: las bajas se sitúan con la base
+            for name in ENTITY_LISTS:
+                spawned[name] = {uid: e for uid, e in spawned[name].items()
+                                 if _in_view(view, e[0], e[1])}
+                live = base.entities[name]
+                removed[name] = {uid for uid in removed[name]
+                                 if uid in live and _in_view(view, live[uid][0], live[uid][1])}
+        return Delta(base, snapshot, spawned, removed)
+
     def get_state_dict(self):
         """
-        Retorna una copia 'segura' del estado para enviar al cliente.
+        Retorna una copia del último estado publicado, sin tomar el lock.
         """
-        with self.lock:
-            data = dict(self.state)
-            # Agrega conteo de virus y enemigos activos (opcional)
-            mites_activos = sum(1 for m in self.shared_mites if m.get('active', True))
-            enemies_activos = sum(1 for e in self.shared_enemies if e.get('active', True))
-            data['mites_activos'] = mites_activos
-            data['enemies_activos'] = enemies_activos
-            return data
+        return dict(self.snapshot.data)
+
+    def zone_view(self, zona):
+        """
+        Rectángulo (x, y, ancho, alto) de una zona de self.zonas, o None.
+        """
+        if zona not in self.zonas:
+            return None
+        return self.zona_offsets[zona] + self.zonas[zona]
 
     def move_robot_manual(self, direction):
         """
-        Mueve el robot en modo manual según la dirección recibida.
+        Mueve el robot en modo manual según la dirección recibida
+        (llamar con el lock tomado; lo hace la simulación).
         """
-        step = 5
-        with self.lock:
-            if direction == 'UP':
-                self.state['y'] -= step
-            elif direction == 'DOWN':
-                self.state['y'] += step
-            elif direction == 'LEFT':
-                self.state['x'] -= step
-            elif direction == 'RIGHT':
-                self.state['x'] += step
+        # Direcciones desconocidas o de otro tipo (listas, dicts...) se ignoran
+        if not isinstance(direction, str):
+            return
+        dx, dy = DIRECTIONS.get(direction, (0, 0))
+        self.move_robot(dx * 5, dy * 5)
+
+    def move_robot(self, dx, dy):
+        """
+        Desplaza el robot sin atravesar paredes (lock tomado).
+        """
+        state = self.state
+        state['x'], state['y'] = slide(state['x'], state['y'], dx, dy, state['radius'])
+
+    def set_key(self, owner, direction, pressed):
+        """
+        Registra que el cliente 'owner' pulsa o suelta una tecla de dirección
+        (lock tomado). Retorna el seq de la foto que ya incluye el cambio.
+        """
+        # Direcciones desconocidas o de otro tipo (listas, dicts...) se ignoran
+        if not isinstance(direction, str) or direction not in DIRECTIONS:
+            return self.seq + 1
+        keys = self.held_keys.setdefault(owner, set())
+        if pressed:
+            keys.add(direction)
+        else:
+            keys.discard(direction)
+            if not keys:
+                del self.held_keys[owner]
+        return self.seq + 1
+
+    def release_keys(self, owner):
+        self.held_keys.pop(owner, None)
+
+    def held_directions(self):
+        """
+        Teclas de dirección pulsadas por cualquiera de los clientes.
+        """
+        held = set()
+        for keys in self.held_keys.values():
+            held |= keys
+        return held
+
+    def set_control_mode(self, mode):
+        """
+        Cambia entre modo 'auto' y 'manual' (llamar con el lock tomado).
+        """
+        if mode in ('auto', 'manual'):
+            self.state['control_mode'] = mode
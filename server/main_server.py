@@ -1,42 +1,38 @@
 # server/main_server.py
-import socket
-import threading
-import json
+import asyncio
+import multiprocessing
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-# Función para verificar si un número es primo (usada para el comando CHECK_PRIME)
-def isprime(n):
-    """Determina si n es un número primo."""
-    try:
-        n = int(n)
-    except:
-        return False
-    if n <= 1:
-        return False
-    if n <= 3:
-        return True
-    if n % 2 == 0 or n % 3 == 0:
-        return False
-    i = 5
-    while i * i <= n:
-        if n % i == 0 or n % (i + 2) == 0:
-            return False
-        i += 6
-    return True
+# Permite importar el paquete 'common' al ejecutar este script directamente
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-from game_state import GameState
-from areas_server import AreaThread
-from roomba_server import RoombaThread
-from spawn_mites_server import MitesThread
-from spawn_enemies_server import EnemiesThread
-from radiation_server import RadiationThread
+from common.primes import isprime, quick_reject, cache as prime_cache
+from game_state import GameState, clamp_view
+from simulation import Simulation
+from connection import ClientConnection
 
 HOST = 'localhost'
 PORT = 5000
+BACKLOG = 512
+
+# CHECK_PRIME: los números grandes se comprueban en otros procesos (el GIL
+# no frena la simulación), con un tiempo máximo por petición. Un núcleo
+# queda para la simulación y el bucle de red.
+PRIME_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# El tiempo máximo sólo descarta las peticiones que aún esperan en la cola:
+# una comprobación ya empezada no se interrumpe y ocupa su proceso hasta
+# acabar. Por eso se limita el tamaño: el peor caso (un primo, BPSW completo)
+# con 3072 bits tarda ~0,4 s en un núcleo, muy por debajo de PRIME_TIMEOUT;
+# con 8192 bits pasaba de 6 s.
+PRIME_TIMEOUT = 5.0
+PRIME_MAX_BITS = 3072
+# Por debajo, isprime tarda microsegundos y se resuelve en el propio bucle
+PRIME_INLINE_LIMIT = 1 << 64
 
 class GameServer:
-    def __init__(self, control_mode):
+    def __init__(self, control_mode, seed=None):
         self.game_state = GameState()
         # Inicialización de variables críticas
         with self.game_state.lock:
@@ -48,108 +44,186 @@ class GameServer:
             self.game_state.state['game_over'] = False
             self.game_state.state['radiacion'] = 10
             self.game_state.state['control_mode'] = control_mode
+            self.game_state.publish()
+
+        # Núcleo de la simulación (un solo hilo con paso de tiempo fijo)
+        self.simulation = Simulation(self.game_state, seed)
+
+        # Conexiones suscritas al estado (sólo se tocan desde el bucle asyncio)
+        self.subscribers = set()
+
+        # Procesos para CHECK_PRIME; se crean en run()
+        self.prime_pool = None
+
+    def start_simulation(self):
+        self.simulation.start()
+
+    def stop_simulation(self):
+        self.simulation.stop()
+        self.simulation.join()
+
+    async def in_simulation(self, fn, *args):
+        """
+        Ejecuta fn dentro del siguiente tick de la simulación sin bloquear
+        el bucle de eventos mientras espera.
+        """
+        return await asyncio.wrap_future(self.simulation.submit(fn, *args))
+
+    async def dispatch(self, conn, msg):
+        """
+        Ejecuta un comando. Retorna la respuesta (un Snapshot o un texto),
+        o None si el comando no tiene respuesta.
+        """
+        comando = msg.get('cmd')
+
+        if comando == 'GET_STATE':
+            return self.game_state.snapshot
+
+        elif comando == 'PING':
+            # Comprobación de salud: responde en cuanto el servidor acepta
+            # conexiones; el pid permite saber qué proceso contestó
+            return f"PONG {os.getpid()}"
+
+        elif comando == 'MOVE':
+            await self.in_simulation(self.game_state.move_robot_manual, msg.get('direction'))
+            return self.game_state.snapshot
+
+        elif comando == 'KEY':
+            # Flanco de tecla; el movimiento se integra en cada tick
+            future = self.simulation.submit(self.game_state.set_key, conn,
+                                            msg.get('key'), bool(msg.get('pressed')))
+            if 'id' not in msg:
+                # Sin id no hay respuesta ni se espera al tick: el orden lo
+                # mantiene la cola de comandos
+                return None
+            # Con id se responde con la foto del tick en que se aplicó (el
+            # cliente la usa para reconciliar su predicción)
+            seq = await asyncio.wrap_future(future)
+            return self.game_state.history.get(seq, self.game_state.snapshot)
+
+        elif comando == 'SET_MODE':
+            await self.in_simulation(self.game_state.set_control_mode, msg.get('mode'))
+            return self.game_state.snapshot
+
+        elif comando == 'SUBSCRIBE':
+            # mode: 'tick' envía cada tick, 'change' sólo si algo cambia
+            snapshot = self.game_state.snapshot
+            conn.on_change = msg.get('mode', 'change') != 'tick'
+            conn.last_pushed = snapshot
+            self.subscribers.add(conn)
+            return snapshot
+
+        elif comando == 'ACK':
+            # Base para los deltas siguientes (0: mandar un keyframe)
+            try:
+                conn.ack(int(msg.get('seq', 0)))
+            except (ValueError, TypeError):
+                conn.ack(0)
+            return None
+
+        elif comando == 'SET_VIEW':
+            # Sólo las entidades dentro de un rectángulo [x, y, ancho, alto]
+            # o de una zona; sin ninguno de los dos se vuelven a enviar todas
+            rect = msg.get('rect')
+            if msg.get('zona') is not None:
+                rect = self.game_state.zone_view(msg['zona'])
+                if rect is None:
+                    return f"Error: Zona desconocida: {msg['zona']}"
+            try:
+                conn.set_view(clamp_view(rect) if rect is not None else None)
+            except (ValueError, TypeError):
+                return "Error: rect debe ser [x, y, ancho, alto]."
+            return self.game_state.snapshot
+
+        elif comando == 'UNSUBSCRIBE':
+            self.unsubscribe(conn)
+            return self.game_state.snapshot
+
+        elif comando == 'CHECK_PRIME':
+            try:
+                numero = int(msg.get('numero'))
+            except (ValueError, TypeError):
+                return "Error: Entrada no es un número entero."
+            if numero.bit_length() > PRIME_MAX_BITS:
+                return f"Error: el número no puede superar {PRIME_MAX_BITS} bits."
+            try:
+                primo = await self.check_prime(numero)
+            except asyncio.TimeoutError:
+                return f"Error: la comprobación de {numero} superó {PRIME_TIMEOUT:.0f} s."
+            if primo:
+                return f"El número {numero} es primo."
+            return f"El número {numero} no es primo."
+
+        return None
+
+    async def check_prime(self, numero):
+        """
+        isprime(numero) en el pool de procesos. Si se agota el tiempo (o se
+        cancela la petición) y aún no había empezado, no llega a ejecutarse.
+        Las respuestas se guardan en la caché de este proceso.
+        """
+        if numero < PRIME_INLINE_LIMIT:
+            return isprime(numero)
+        # Los que tienen un divisor pequeño no ocupan la caché ni el pool
+        if quick_reject(numero):
+            return False
+        primo = prime_cache.get(numero)
+        if primo is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.prime_pool, isprime, numero)
+            primo = await asyncio.wait_for(future, PRIME_TIMEOUT)
+            prime_cache.put(numero, primo)
+        return primo
+
+    def unsubscribe(self, conn):
+        self.subscribers.discard(conn)
+
+    def release_keys(self, conn):
+        # Un cliente que se va no deja teclas pulsadas
+        self.simulation.submit(self.game_state.release_keys, conn)
+
+    def broadcast(self, snapshot):
+        for conn in self.subscribers:
+            conn.push(snapshot)
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        # Puente simulación -> bucle: cada foto publicada se reparte en el bucle
+        def listener(snapshot):
+            loop.call_soon_threadsafe(self.broadcast, snapshot)
+
+        async def on_connect(reader, writer):
+            await ClientConnection(self, reader, writer).run()
 
-        # Hilos de lógica
-        self.area_thread = AreaThread(self.game_state)
-        self.roomba_thread = RoombaThread(self.game_state)
-        self.mites_thread = MitesThread(self.game_state)
-        self.enemies_thread = EnemiesThread(self.game_state)
-        self.radiation_thread = RadiationThread(self.game_state)
-
-        # Socket
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.bind((HOST, PORT))
-        self.server_socket.listen(5)
-        print(f"[Server] Escuchando en {HOST}:{PORT}")
-
-    def start_threads(self):
-        self.area_thread.start()
-        self.roomba_thread.start()
-        self.mites_thread.start()
-        self.enemies_thread.start()
-        self.radiation_thread.start()
-
-    def stop_threads(self):
-        self.area_thread.stop()
-        self.roomba_thread.stop()
-        self.mites_thread.stop()
-        self.enemies_thread.stop()
-        self.radiation_thread.stop()
-
-        self.area_thread.join()
-        self.roomba_thread.join()
-        self.mites_thread.join()
-        self.enemies_thread.join()
-        self.radiation_thread.join()
-
-    def handle_client(self, conn, addr):
-        print(f"[Server] Cliente conectado: {addr}")
+        with self.game_state.lock:
+            self.game_state.listeners.append(listener)
         try:
-            while True:
-                data = conn.recv(4096)
-                if not data:
-                    break
-
-                msg = json.loads(data.decode('utf-8'))
-                comando = msg.get('cmd')
-
-                if comando == 'GET_STATE':
-                    state = self.game_state.get_state_dict()
-                    conn.sendall(json.dumps(state).encode('utf-8'))
-
-                elif comando == 'MOVE':
-                    direction = msg.get('direction')
-                    self.game_state.move_robot_manual(direction)
-                    state = self.game_state.get_state_dict()
-                    conn.sendall(json.dumps(state).encode('utf-8'))
-
-                elif comando == 'SET_MODE':
-                    mode = msg.get('mode')
-                    with self.game_state.lock:
-                        self.game_state.state['control_mode'] = mode
-                    state = self.game_state.get_state_dict()
-                    conn.sendall(json.dumps(state).encode('utf-8'))
-
-                elif comando == 'CHECK_PRIME':
-                    try:
-                        numero = int(msg.get('numero'))
-                    except (ValueError, TypeError):
-                        respuesta = "Error: Entrada no es un número entero."
-                        conn.sendall(respuesta.encode('utf-8'))
-                        continue
-                    if isprime(numero):
-                        respuesta = f"El número {numero} es primo."
-                    else:
-                        respuesta = f"El número {numero} no es primo."
-                    conn.sendall(respuesta.encode('utf-8'))
-
-                elif comando == 'EXIT':
-                    break
-
-                else:
-                    pass
-
-        except Exception as e:
-            print(f"[Server] Error con el cliente {addr}: {e}")
+            server = await asyncio.start_server(on_connect, HOST, PORT, backlog=BACKLOG)
+            print(f"[Server] Escuchando en {HOST}:{PORT}")
+            async with server:
+                await server.serve_forever()
         finally:
-            conn.close()
-            print(f"[Server] Cliente desconectado: {addr}")
+            with self.game_state.lock:
+                self.game_state.listeners.remove(listener)
 
     def run(self):
-        self.start_threads()
+        # forkserver (o spawn donde no existe): los procesos no se clonan del
+        # servidor, que ya tiene hilos en marcha
+        metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.prime_pool = ProcessPoolExecutor(
+            max_workers=PRIME_WORKERS, mp_context=multiprocessing.get_context(metodo))
+        self.start_simulation()
         try:
-            while True:
-                conn, addr = self.server_socket.accept()
-                client_thread = threading.Thread(target=self.handle_client, args=(conn, addr))
-                client_thread.start()
+            asyncio.run(self.serve())
         except KeyboardInterrupt:
             print("\n[Server] Cerrando servidor...")
         finally:
-            self.stop_threads()
-            self.server_socket.close()
+            self.stop_simulation()
+            self.prime_pool.shutdown(wait=False)
 
 if __name__ == "__main__":
     # Si se pasa un argumento, se usa ese modo; de lo contrario se hace el input interactivo.
+    # Un segundo argumento opcional fija la semilla para repetir la misma partida.
     if len(sys.argv) > 1:
         control_mode = sys.argv[1].lower()
         if control_mode not in ['manual', 'auto']:
@@ -157,5 +231,6 @@ if __name__ == "__main__":
     else:
         mode_input = input("Seleccione modo (M)anual o (A)utomático: ").strip().lower()
         control_mode = 'manual' if mode_input == 'm' else 'auto'
-    server = GameServer(control_mode)
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    server = GameServer(control_mode, seed)
     server.run()
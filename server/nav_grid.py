@@ -0,0 +1,79 @@
+# server/nav_grid.py
+from common.world import WINDOW_WIDTH, WINDOW_HEIGHT, ROBOT_RADIUS, in_barrera, in_hueco
+
+GRID_STEP = 10
+
+
+class NavGrid:
+    """
+    Rejilla de navegación precalculada sobre los puntos múltiplos de GRID_STEP.
+
+    Cada celda se identifica por un índice entero (fila * cols + col).
+    'walkable' es un bytearray con 1 si el robot cabe en esa celda y
+    'neighbors' guarda, para cada celda, la tupla de índices vecinos
+    transitables. Tras construirla, la búsqueda sólo hace consultas a arrays.
+    """
+
+    def __init__(self, width=WINDOW_WIDTH, height=WINDOW_HEIGHT,
+                 step=GRID_STEP, radius=ROBOT_RADIUS):
+        self.step = step
+        self.radius = radius
+        self.cols = width // step + 1
+        self.rows = height // step + 1
+        size = self.cols * self.rows
+
+        # Mapa de celdas transitables (1 byte por celda)
+        self.walkable = bytearray(size)
+        for idx in range(size):
+            x, y = self.to_point(idx)
+            if in_barrera(x, y, radius) and not in_hueco(x, y, radius):
+                self.walkable[idx] = 1
+
+        # Vecinos transitables de cada celda (también de las no transitables,
+        # para que el robot pueda salir si arranca fuera de la rejilla libre)
+        cols, rows = self.cols, self.rows
+        walkable = self.walkable
+        self.neighbors = []
+        for idx in range(size):
+            row, col = divmod(idx, cols)
+            vecinos = []
+            # Mismo orden que el BFS original: derecha, izquierda, abajo, arriba
+            if col + 1 < cols and walkable[idx + 1]:
+                vecinos.append(idx + 1)
+            if col > 0 and walkable[idx - 1]:
+                vecinos.append(idx - 1)
+            if row + 1 < rows and walkable[idx + cols]:
+                vecinos.append(idx + cols)
+            if row > 0 and walkable[idx - cols]:
+                vecinos.append(idx - cols)
+            self.neighbors.append(tuple(vecinos))
+
+    def snap(self, val):
+        return int(round(val / self.step) * self.step)
+
+    def to_index(self, x, y):
+        """
+        Índice de la celda más cercana a (x, y), o None si cae fuera de la rejilla.
+        """
+        col = int(round(x / self.step))
+        row = int(round(y / self.step))
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return row * self.cols + col
+        return None
+
+    def to_point(self, idx):
+        row, col = divmod(idx, self.cols)
+        return col * self.step, row * self.step
+
+    def set_walkable(self, idx, walkable):
+        """
+        Abre o cierra una celda y actualiza las listas de vecinos afectadas.
+        """
+        self.walkable[idx] = 1 if walkable else 0
+        row, col = divmod(idx, self.cols)
+        for nb in (idx + 1, idx - 1, idx + self.cols, idx - self.cols):
+            if 0 <= nb < len(self.walkable) and (nb // self.cols == row or nb % self.cols == col):
+                vecinos = [v for v in self.neighbors[nb] if v != idx]
+                if walkable:
+                    vecinos.append(idx)
+                self.neighbors[nb] = tuple(vecinos)
@@ -0,0 +1,177 @@
+# server/planner.py
+import heapq
+from array import array
+
+INF = 2**31 - 1
+
+
+class IncrementalPlanner:
+    """
+    Planificador incremental para el modo automático.
+
+    En vez de lanzar una BFS desde el robot en cada replanificación, mantiene
+    un campo de distancias desde todos los virus activos hasta cada celda de
+    la NavGrid (búsqueda hacia atrás, como D* Lite), así el robot puede moverse
+    sin invalidar nada: le basta bajar por el gradiente.
+
+    Cada celda guarda además 'label', la celda objetivo de la que procede su
+    distancia. Al aparecer un virus sólo se propagan las celdas que mejoran;
+    al desaparecer (o al bloquearse una celda) sólo se invalida y repara la
+    región que dependía de él. El coste es proporcional al cambio, no al mapa.
+    """
+
+    def __init__(self, nav):
+        self.nav = nav
+        size = len(nav.walkable)
+        self.dist = array('i', [INF]) * size
+        self.label = array('i', [-1]) * size
+
+        self.targets = {}   # clave del objetivo -> celda (o None si fuera de la rejilla)
+        self.sources = {}   # celda -> número de objetivos en ella
+
+    # -----------------------------
+    # OBJETIVOS
+    # -----------------------------
+    def add_target(self, key, x, y):
+        idx = self.nav.to_index(x, y)
+        self.targets[key] = idx
+        if idx is None:
+            return
+        count = self.sources.get(idx, 0)
+        self.sources[idx] = count + 1
+        if count == 0 and self.nav.walkable[idx]:
+            self._propagate([(0, idx, idx)])
+
+    def remove_target(self, key):
+        idx = self.targets.pop(key, None)
+        if idx is None:
+            return
+        count = self.sources[idx] - 1
+        if count > 0:
+            self.sources[idx] = count
+            return
+        del self.sources[idx]
+        if self.label[idx] == idx:
+            self._repair(self._region(idx))
+
+    # -----------------------------
+    # OBSTÁCULOS
+    # -----------------------------
+    def set_walkable(self, idx, walkable):
+        """
+        Abre o cierra una celda del mapa y repara el campo de distancias.
+        """
+        if bool(self.nav.walkable[idx]) == bool(walkable):
+            return
+        if walkable:
+            self.nav.set_walkable(idx, True)
+            if idx in self.sources:
+                self._propagate([(0, idx, idx)])
+            else:
+                self._propagate(self._boundary([idx]))
+        else:
+            # La región se recorre antes de cerrar la celda, porque las
+            # cadenas de celdas que pasaban por ella dependen de su etiqueta
+            region = self._region(self.label[idx]) if self.dist[idx] < INF else []
+            self.nav.set_walkable(idx, False)
+            self.dist[idx] = INF
+            self.label[idx] = -1
+            self._repair(region)
+
+    # -----------------------------
+    # CONSULTAS
+    # -----------------------------
+    def next_step(self, idx):
+        """
+        Celda vecina a la que avanzar desde 'idx' para acercarse al objetivo
+        alcanzable más cercano, o None si no hay ninguno.
+        """
+        if idx is None:
+            return None
+        best = None
+        best_dist = self.dist[idx]
+        for nb in self.nav.neighbors[idx]:
+            if self.dist[nb] < best_dist:
+                best = nb
+                best_dist = self.dist[nb]
+        return best
+
+    # -----------------------------
+    # REPARACIÓN
+    # -----------------------------
+    def _region(self, lab):
+        """
+        Celdas cuya distancia procede del objetivo 'lab'. Forman una región
+        conexa porque la cadena de cada celda hasta 'lab' lleva su misma etiqueta.
+        """
+        if lab < 0 or self.label[lab] != lab:
+            return []
+        label = self.label
+        neighbors = self.nav.neighbors
+        region = [lab]
+        seen = {lab}
+        for cell in region:
+            for nb in neighbors[cell]:
+                if nb not in seen and label[nb] == lab:
+                    seen.add(nb)
+                    region.append(nb)
+        return region
+
+    def _repair(self, region):
+        for cell in region:
+            self.dist[cell] = INF
+            self.label[cell] = -1
+        seeds = self._boundary(region)
+        walkable = self.nav.walkable
+        for cell in region:
+            if cell in self.sources and walkable[cell]:
+                seeds.append((0, cell, cell))
+        self._propagate(seeds)
+
+    def _boundary(self, cells):
+        """
+        Mejor distancia candidata de cada celda a partir de sus vecinos válidos.
+        """
+        dist = self.dist
+        label = self.label
+        neighbors = self.nav.neighbors
+        walkable = self.nav.walkable
+        seeds = []
+        for cell in cells:
+            if not walkable[cell]:
+                continue
+            best = INF
+            best_label = -1
+            for nb in neighbors[cell]:
+                if dist[nb] < best:
+                    best = dist[nb]
+                    best_label = label[nb]
+            if best < INF:
+                seeds.append((best + 1, cell, best_label))
+        return seeds
+
+    def _propagate(self, seeds):
+        """
+        Dijkstra acotado: sólo avanza por celdas cuya distancia mejora.
+        """
+        dist = self.dist
+        label = self.label
+        neighbors = self.nav.neighbors
+        heap = []
+        for d, cell, lab in seeds:
+            if d < dist[cell]:
+                dist[cell] = d
+                label[cell] = lab
+                heap.append((d, cell))
+        heapq.heapify(heap)
+        while heap:
+            d, cell = heapq.heappop(heap)
+            if d != dist[cell]:
+                continue
+            lab = label[cell]
+            nd = d + 1
+            for nb in neighbors[cell]:
+                if nd < dist[nb]:
+                    dist[nb] = nd
+                    label[nb] = lab
+                    heapq.heappush(heap, (nd, nb))
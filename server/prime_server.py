@@ -1,68 +1,264 @@
 # server/prime_server.py
-import socket
+import asyncio
 import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-# Configuración del logging para registrar la actividad
-logging.basicConfig(
-    filename='servidor.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-
-def isprime(n):
-    """Determina si n es un número primo."""
-    if n <= 1:
-        return False
-    if n <= 3:
-        return True
-    if n % 2 == 0 or n % 3 == 0:
-        return False
-    i = 5
-    while i * i <= n:
-        if n % i == 0 or n % (i + 2) == 0:
-            return False
-        i += 6
-    return True
+# Permite importar el paquete 'common' al ejecutar este script directamente
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.primes import (isprime, quick_reject, count_primes, prime_segments, open_table,
+                           cache)
+
+HOST = '127.0.0.1'
+PUERTO = 8809
+
+# Longitud máxima de una línea de petición (un BATCH largo)
+MAX_LINEA = 1 << 20
+
+# Anchura máxima de un intervalo en COUNT y RANGE
+MAX_RANGO = 10**9
+
+# Reparto del trabajo entre los procesos: números de un BATCH y anchura de
+# los trozos de COUNT y RANGE que se envían a cada tarea
+BATCH_TROZO = 256
+RANGO_TROZO = 1 << 21
+
+# Trozos de un RANGE calculándose a la vez por delante del que se envía
+RANGO_ADELANTO = 2 * (os.cpu_count() or 1)
+
+# Por debajo de este valor isprime tarda microsegundos y no compensa
+# enviarlo a otro proceso
+LIMITE_LOCAL = 1 << 64
+
+
+def marcar(numeros):
+    """
+    '1' o '0' por cada número según sea primo o no (se ejecuta en el pool).
+    """
+    return ['1' if isprime(n) else '0' for n in numeros]
 
-def iniciar_servidor():
-    host = '127.0.0.1'
-    puerto = 8809
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.bind((host, puerto))
-    server_socket.listen(5)
-    print(f"Servidor escuchando en {host}:{puerto}...")
-
-    while True:
-        conexion, direccion = server_socket.accept()
-        print(f"Conexión establecida con {direccion}")
-        try:
-            datos = conexion.recv(1024)
-            if not datos:
-                continue
 
+def primos_entre(a, b):
+    """
+    Lista de los primos de [a, b] (se ejecuta en el pool).
+    """
+    return [p for primos in prime_segments(a, b) for p in primos]
+
+
+def trozos(a, b, ancho):
+    """
+    Divide [a, b] en intervalos consecutivos de 'ancho' números.
+    """
+    while a <= b:
+        yield a, min(a + ancho - 1, b)
+        a += ancho
+
+
+def leer_rango(args):
+    """
+    (a, b) de los argumentos de COUNT y RANGE; ValueError si no son válidos.
+    """
+    if len(args) != 2:
+        raise ValueError("Error: se esperan dos enteros a y b.")
+    try:
+        a, b = int(args[0]), int(args[1])
+    except ValueError:
+        raise ValueError("Error: a y b deben ser números enteros.")
+    if b - a > MAX_RANGO:
+        raise ValueError(f"Error: el intervalo no puede superar {MAX_RANGO} números.")
+    return a, b
+
+
+class PrimeServer:
+    """
+    Servidor de primos: muchas conexiones a la vez en un bucle asyncio, cada
+    una con tantas peticiones como quiera (una por línea). El cálculo pesado
+    va a un pool de procesos, uno por núcleo, y no lo frena el GIL.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+
+    async def calcular(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, func, *args)
+
+    async def atender(self, peticion, writer):
+        """
+        Responde a una petición y retorna el texto que se registra en el log.
+        Cada respuesta termina en salto de línea.
+
+          <n>              "El número n es primo." / "El número n no es primo."
+          BATCH n1 n2 ...  una línea con 1 (primo) o 0 por cada número, en orden
+          COUNT a b        "Hay k primos en [a, b]."
+          RANGE a b        los primos de [a, b] separados por espacios, en varias
+                           líneas a medida que se calculan; termina con una
+                           línea vacía
+          STATS            aciertos y fallos de la caché de respuestas
+        """
+        comando, *args = peticion.split()
+        comando = comando.upper()
+
+        if comando == 'BATCH':
+            try:
+                numeros = [int(arg) for arg in args]
+            except ValueError:
+                respuesta = "Error: BATCH sólo admite números enteros."
+            else:
+                partes = await asyncio.gather(*(
+                    self.calcular(marcar, numeros[i:i + BATCH_TROZO])
+                    for i in range(0, len(numeros), BATCH_TROZO)))
+                respuesta = ' '.join(flag for parte in partes for flag in parte)
+                writer.write((respuesta + '\n').encode())
+                return f"BATCH de {len(numeros)} números"
+
+        elif comando in ('COUNT', 'RANGE'):
+            try:
+                a, b = leer_rango(args)
+            except ValueError as e:
+                respuesta = str(e)
+            else:
+                if comando == 'COUNT':
+                    cuentas = await asyncio.gather(*(
+                        self.calcular(count_primes, x, y) for x, y in trozos(a, b, RANGO_TROZO)))
+                    respuesta = f"Hay {sum(cuentas)} primos en [{a}, {b}]."
+                else:
+                    total = await self.enviar_rango(a, b, writer)
+                    return f"RANGE [{a}, {b}]: {total} primos"
+
+        elif comando == 'STATS':
+            info = cache.info()
+            table = open_table()
+            respuesta = (f"Caché: {info['hits']} aciertos, {info['misses']} fallos, "
+                         f"{info['size']}/{info['maxsize']} entradas; "
+                         + (f"tabla hasta {table.limit}." if table else "sin tabla."))
+
+        else:
             # Intentar convertir los datos recibidos a entero
             try:
-                numero = int(datos.decode().strip())
+                numero = int(peticion)
             except ValueError:
                 respuesta = "Error: Entrada no es un número entero."
-                conexion.send(respuesta.encode())
-                logging.error(f"Datos inválidos recibidos: {datos.decode().strip()}")
-                conexion.close()
-                continue
-
-            # Verificar si el número es primo
-            if isprime(numero):
-                respuesta = f"El número {numero} es primo."
             else:
-                respuesta = f"El número {numero} no es primo."
+                # Verificar si el número es primo
+                if numero < LIMITE_LOCAL:
+                    primo = isprime(numero)
+                elif quick_reject(numero):
+                    # Con un divisor pequeño no ocupa la caché ni el pool
+                    primo = False
+                else:
+                    # La caché de este proceso evita repetir el cálculo en el pool
+                    primo = cache.get(numero)
+                    if primo is None:
+                        primo = await self.calcular(isprime, numero)
+                        cache.put(numero, primo)
+                if primo:
+                    respuesta = f"El número {numero} es primo."
+                else:
+                    respuesta = f"El número {numero} no es primo."
+
+        writer.write((respuesta + '\n').encode())
+        return respuesta
+
+    async def enviar_rango(self, a, b, writer):
+        """
+        Envía los primos de [a, b] en orden, con los siguientes trozos
+        calculándose mientras tanto en el pool. Si el cliente se va, se
+        cancelan los que aún no empezaron.
+        """
+        pendientes = deque()
+        intervalos = trozos(a, b, RANGO_TROZO)
+        total = 0
+        try:
+            while True:
+                for x, y in intervalos:
+                    pendientes.append(asyncio.ensure_future(self.calcular(primos_entre, x, y)))
+                    if len(pendientes) >= RANGO_ADELANTO:
+                        break
+                if not pendientes:
+                    break
+                primos = await pendientes.popleft()
+                if primos:
+                    writer.write((' '.join(map(str, primos)) + '\n').encode())
+                    total += len(primos)
+                    await writer.drain()
+            writer.write(b'\n')
+        finally:
+            for futuro in pendientes:
+                futuro.cancel()
+        return total
 
-            # Enviar la respuesta al cliente
-            conexion.send(respuesta.encode())
-            logging.info(f"Recibido: {numero} - Respuesta: {respuesta}")
+    async def atender_cliente(self, reader, writer):
+        direccion = writer.get_extra_info('peername')
+        print(f"Conexión establecida con {direccion}")
+        try:
+            while True:
+                try:
+                    linea = await reader.readline()
+                except ValueError:
+                    writer.write(f"Error: la petición supera {MAX_LINEA} bytes.\n".encode())
+                    logging.error(f"Petición demasiado larga de {direccion}")
+                    break
+                if not linea:
+                    break
+                peticion = linea.decode(errors='replace').strip()
+                if not peticion:
+                    continue
+
+                respuesta = await self.atender(peticion, writer)
+                await writer.drain()
+                if respuesta.startswith("Error"):
+                    logging.error(f"Petición inválida: {peticion[:100]} - {respuesta}")
+                else:
+                    logging.info(f"Recibido: {peticion[:100]} - Respuesta: {respuesta[:100]}")
+        except ConnectionError:
+            pass
         except Exception as e:
             logging.error(f"Error en la conexión: {e}")
         finally:
-            conexion.close()
+            writer.close()
+
+    async def serve(self):
+        server = await asyncio.start_server(self.atender_cliente, HOST, PUERTO, limit=MAX_LINEA)
+        print(f"Servidor escuchando en {HOST}:{PUERTO} ({self.workers} procesos)...")
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        # El pool se crea antes que el hilo del log y sin fork, para no clonar
+        # un proceso que ya tiene hilos en marcha
+        metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context(metodo))
+
+        # El log se escribe desde un hilo aparte: el bucle sólo encola
+        registros = queue.SimpleQueue()
+        archivo = logging.FileHandler('servidor.log')
+        archivo.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        escritor = logging.handlers.QueueListener(registros, archivo)
+        raiz = logging.getLogger()
+        raiz.setLevel(logging.INFO)
+        raiz.addHandler(logging.handlers.QueueHandler(registros))
+        escritor.start()
+
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("\nCerrando servidor...")
+        finally:
+            self.pool.shutdown()
+            escritor.stop()
+
+
+def iniciar_servidor():
+    PrimeServer().run()
 
 if __name__ == '__main__':
     iniciar_servidor()
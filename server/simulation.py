@@ -0,0 +1,153 @@
+# server/simulation.py
+import heapq
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from areas_server import AreaCalculator
+from roomba_server import Roomba
+from spawn_mites_server import MitesSpawner
+from spawn_enemies_server import EnemiesSpawner
+from radiation_server import Radiation
+from common.world import TICK
+
+
+def to_ticks(seconds):
+    return max(1, int(round(seconds / TICK)))
+
+
+class Simulation(threading.Thread):
+    """
+    Núcleo de la simulación: un único hilo con paso de tiempo fijo.
+
+    Toda la lógica del juego se ejecuta aquí, con una sola adquisición de
+    game_state.lock por tick. Los sucesos periódicos (movimiento del robot,
+    apariciones de virus y enemigos, subida de radiación) viven en una cola
+    de prioridad ordenada por (tick, secuencia); con la misma semilla el
+    orden de ejecución es siempre el mismo.
+    """
+
+    def __init__(self, game_state, seed=None):
+        super().__init__()
+        self.game_state = game_state
+        self._stop_event = threading.Event()
+
+        self.rng = random.Random(seed)
+        self.tick = 0
+        self._events = []
+        self._seq = 0
+
+        # Comandos de los clientes, aplicados al principio del siguiente tick
+        self._commands = queue.SimpleQueue()
+
+        self.areas = AreaCalculator(game_state)
+        self.roomba = Roomba(game_state)
+        self.mites = MitesSpawner(game_state, self.rng)
+        self.enemies = EnemiesSpawner(game_state, self.rng)
+        self.radiation = Radiation(game_state)
+
+        # Programación inicial (el orden de alta desempata sucesos del mismo tick)
+        self.schedule(1, self._move_robot)
+        self.schedule(to_ticks(self.mites.next_delay()), self._spawn_mite)
+        self.schedule(to_ticks(self.enemies.next_delay()), self._spawn_enemy)
+        self.schedule(to_ticks(Radiation.PERIOD), self._radiation_step)
+
+    # -----------------------------
+    # COLA DE SUCESOS
+    # -----------------------------
+    def schedule(self, delay_ticks, callback):
+        """
+        Programa 'callback' para dentro de 'delay_ticks' ticks. El callback
+        retorna el número de ticks hasta su siguiente ejecución, o None.
+        """
+        self._seq += 1
+        heapq.heappush(self._events, (self.tick + delay_ticks, self._seq, callback))
+
+    def submit(self, fn, *args):
+        """
+        Encola fn(*args) para ejecutarla dentro del siguiente tick (con el
+        lock tomado). Se puede llamar desde cualquier hilo; retorna un Future
+        que se resuelve con su resultado después de publicar ese tick.
+        """
+        future = Future()
+        self._commands.put((future, fn, args))
+        return future
+
+    def _run_commands(self):
+        done = []
+        while True:
+            try:
+                future, fn, args = self._commands.get_nowait()
+            except queue.Empty:
+                return done
+            try:
+                done.append((future, fn(*args), None))
+            except Exception as e:
+                done.append((future, None, e))
+
+    def _move_robot(self):
+        self.roomba.tick()
+        return 1
+
+    def _spawn_mite(self):
+        self.mites.spawn()
+        return to_ticks(self.mites.next_delay())
+
+    def _spawn_enemy(self):
+        self.enemies.spawn()
+        return to_ticks(self.enemies.next_delay())
+
+    def _radiation_step(self):
+        self.radiation.step()
+        return to_ticks(Radiation.PERIOD)
+
+    # -----------------------------
+    # BUCLE PRINCIPAL
+    # -----------------------------
+    def step(self):
+        """
+        Avanza un tick ejecutando los sucesos vencidos y publica la foto
+        del estado resultante (con el lock tomado).
+        """
+        self.tick += 1
+        done = self._run_commands()
+        events = self._events
+        while events and events[0][0] <= self.tick:
+            if self.game_state.state['game_over']:
+                break
+            _, _, callback = heapq.heappop(events)
+            delay = callback()
+            if delay is not None:
+                self.schedule(delay, callback)
+        self.game_state.publish()
+
+        for future, result, error in done:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def run(self):
+        print("[Simulation] Iniciando simulación...")
+        with self.game_state.lock:
+            self.areas.run()
+
+        # Tras el game over se sigue en marcha para atender los comandos
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            with self.game_state.lock:
+                self.step()
+
+            next_tick += TICK
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                # Vamos con retraso: no intentar recuperar los ticks perdidos
+                next_tick = time.monotonic()
+        print("[Simulation] Finalizada.")
+
+    def stop(self):
+        self._stop_event.set()
@@ -1,39 +1,27 @@
 # server/spawn_enemies_server.py
-import threading
 import random
-import time
 
-class EnemiesThread(threading.Thread):
-    def __init__(self, game_state):
-        super().__init__()
-        self.game_state = game_state
-        self._stop_event = threading.Event()
+from common.world import KIND_RED
 
-    def run(self):
-        print("[EnemiesThread] Iniciando aparición de enemigos rojos...")
-        while not self._stop_event.is_set():
-            with self.game_state.lock:
-                if self.game_state.state['game_over']:
-                    break
-            time.sleep(random.uniform(2.0, 4.0))
+class EnemiesSpawner:
+    """
+    Aparición de enemigos rojos. La Simulation llama a spawn() (con el lock
+    tomado) y vuelve a programarlo tras next_delay() segundos.
+    """
 
-            with self.game_state.lock:
-                zona_key = random.choice(list(self.game_state.zonas.keys()))
-                ancho, alto = self.game_state.zonas[zona_key]
-                ox, oy = self.game_state.zona_offsets[zona_key]
+    def __init__(self, game_state, rng=None):
+        self.game_state = game_state
+        self.rng = rng or random.Random()
 
-            x = random.randint(ox, ox + ancho - 1)
-            y = random.randint(oy, oy + alto - 1)
-            enemy = {
-                'x': x,
-                'y': y,
-                'active': True,
-                'color': 'red'
-            }
+    def next_delay(self):
+        return self.rng.uniform(2.0, 4.0)
 
-            with self.game_state.lock:
-                self.game_state.shared_enemies.append(enemy)
-            print(f"[EnemiesThread] Nuevo enemigo en {zona_key}: ({x}, {y})")
+    def spawn(self):
+        zona_key = self.rng.choice(list(self.game_state.zonas.keys()))
+        ancho, alto = self.game_state.zonas[zona_key]
+        ox, oy = self.game_state.zona_offsets[zona_key]
 
-    def stop(self):
-        self._stop_event.set()
+        x = self.rng.randint(ox, ox + ancho - 1)
+        y = self.rng.randint(oy, oy + alto - 1)
+        self.game_state.shared_enemies.spawn(x, y, KIND_RED)
+        print(f"[EnemiesSpawner] Nuevo enemigo en {zona_key}: ({x}, {y})")
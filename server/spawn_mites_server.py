@@ -1,43 +1,31 @@
 # server/spawn_mites_server.py
-import threading
 import random
-import time
 
-class MitesThread(threading.Thread):
-    def __init__(self, game_state):
-        super().__init__()
-        self.game_state = game_state
-        self._stop_event = threading.Event()
+from common.world import KIND_WHITE, KIND_GREEN
 
-    def run(self):
-        print("[MitesThread] Iniciando dispersión de virus...")
-        while not self._stop_event.is_set():
-            with self.game_state.lock:
-                if self.game_state.state['game_over']:
-                    break
-            time.sleep(random.uniform(0.5, 1.5))
+class MitesSpawner:
+    """
+    Dispersión de virus. La Simulation llama a spawn() (con el lock tomado)
+    y vuelve a programarlo tras next_delay() segundos.
+    """
 
-            # Elegir una zona al azar
-            with self.game_state.lock:
-                zona_key = random.choice(list(self.game_state.zonas.keys()))
-                ancho, alto = self.game_state.zonas[zona_key]
-                ox, oy = self.game_state.zona_offsets[zona_key]
+    def __init__(self, game_state, rng=None):
+        self.game_state = game_state
+        self.rng = rng or random.Random()
 
-            x = random.randint(ox, ox + ancho - 1)
-            y = random.randint(oy, oy + alto - 1)
-            virus_color = 'green' if random.random() < 0.2 else 'white'
-            virus = {
-                'x': x,
-                'y': y,
-                'active': True,
-                'color': virus_color
-            }
+    def next_delay(self):
+        return self.rng.uniform(0.5, 1.5)
 
-            with self.game_state.lock:
-                self.game_state.shared_mites.append(virus)
+    def spawn(self):
+        # Elegir una zona al azar
+        zona_key = self.rng.choice(list(self.game_state.zonas.keys()))
+        ancho, alto = self.game_state.zonas[zona_key]
+        ox, oy = self.game_state.zona_offsets[zona_key]
 
-            color_txt = "VERDE" if virus_color == 'green' else "BLANCO"
-            print(f"[MitesThread] Nuevo virus {color_txt} en {zona_key}: ({x}, {y})")
+        x = self.rng.randint(ox, ox + ancho - 1)
+        y = self.rng.randint(oy, oy + alto - 1)
+        virus_kind = KIND_GREEN if self.rng.random() < 0.2 else KIND_WHITE
+        self.game_state.shared_mites.spawn(x, y, virus_kind)
 
-    def stop(self):
-        self._stop_event.set()
+        color_txt = "VERDE" if virus_kind == KIND_GREEN else "BLANCO"
+        print(f"[MitesSpawner] Nuevo virus {color_txt} en {zona_key}: ({x}, {y})")